@@ -0,0 +1,103 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from .config import settings
+
+class CacheBackend(ABC):
+    """Storage behind the entity cache.
+
+    Values are plain dicts so an out-of-process backend (Redis, memcached)
+    can serialize them; implement these methods and register it in BACKENDS.
+    A backend missing one of them can't be instantiated, so make_cache() fails
+    at startup rather than on the first call.
+    """
+
+    @abstractmethod
+    def get(self, key: str):
+        """Return the cached value, or None on a miss."""
+
+    @abstractmethod
+    def set(self, key: str, value) -> None: ...
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    @abstractmethod
+    def stats(self) -> dict: ...
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with a per-entry TTL and a bounded size."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()  # key -> (expires_at, value), oldest first
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del self.data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "backend": "memory",
+                "size": len(self.data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+BACKENDS = {"memory": MemoryCache}
+
+def make_cache() -> CacheBackend:
+    try:
+        backend = BACKENDS[settings.CACHE_BACKEND]
+    except KeyError:
+        raise ValueError(f"Unknown CACHE_BACKEND: {settings.CACHE_BACKEND}")
+    return backend(maxsize=settings.CACHE_MAXSIZE, ttl=settings.CACHE_TTL_SECONDS)
+
+# shared by crud for GET /students/{id} and GET /courses/{id}
+entity_cache = make_cache()
+
+def student_key(student_id: int) -> str:
+    return f"student:{student_id}"
+
+def course_key(course_id: int) -> str:
+    return f"course:{course_id}"
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+
+class ChangeNotifier:
+    """Wakes the change-feed streams of this process when crud commits a scraped_resources change.
+
+    Commits made by other processes (the scraper's save_to_db) don't come
+    through here; the streams also re-read the feed every
+    CHANGE_FEED_POLL_SECONDS to pick those up.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waiters = set()
+
+    def notify(self):
+        # called from whichever thread committed, after the commit
+        with self.lock:
+            waiters = list(self.waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # that stream's event loop is closed
+                pass
+
+    @contextmanager
+    def listen(self):
+        """Yield an asyncio.Event set by the next notify().
+
+        Enter before reading the feed, so a commit that lands between the read
+        and the wait still wakes the stream.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.lock:
+            self.waiters.add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self.lock:
+                self.waiters.discard(waiter)
+
+notifier = ChangeNotifier()
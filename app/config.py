@@ -2,6 +2,33 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///sms.db"
+    # "default" or "performance" (WAL, tuned pragmas, reader pool + single writer)
+    SQLITE_PROFILE: str = "default"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KIB: int = 64 * 1024
+    SQLITE_READ_POOL_SIZE: int = 8
+    # rows per IN lookup / executemany batch when ingesting scraped items
+    INGEST_CHUNK_SIZE: int = 500
+    # threads working through background imports (POST /import/scraped?async=true)
+    IMPORT_JOB_WORKERS: int = 2
+    # a running job whose runner hasn't renewed its lease for this long is taken over
+    IMPORT_JOB_LEASE_SECONDS: float = 60.0
+    # change-feed streams re-read the feed this often for commits made by other
+    # processes (this process's own commits wake them at once)
+    CHANGE_FEED_POLL_SECONDS: float = 1.0
+    # an idle stream sends an SSE comment this often, so proxies keep it open
+    CHANGE_FEED_KEEPALIVE_SECONDS: float = 15.0
+    # upper bound for the `limit` query parameter on list endpoints
+    MAX_PAGE_SIZE: int = 500
+    # read-through cache for GET /students/{id} and GET /courses/{id}
+    CACHE_BACKEND: str = "memory"
+    CACHE_MAXSIZE: int = 10000
+    CACHE_TTL_SECONDS: float = 60.0
+    # add X-DB-Query-Count / X-DB-Time-Ms headers to every response
+    SQL_DEBUG_HEADERS: bool = False
+    # log a warning when one request runs more queries than this (0 = off)
+    QUERY_COUNT_WARN_THRESHOLD: int = 0
 
     class Config:
         env_file = ".env"
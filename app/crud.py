@@ -1,7 +1,28 @@
+import base64
+import json
+from datetime import datetime, timezone
+from sqlalchemy import and_, delete, func, insert, literal_column, or_, select, update
+from sqlalchemy.dialects.mysql import match as mysql_match
+from sqlalchemy.sql import column, table
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, search
+from .changes import notifier
+from .cache import course_key, entity_cache, student_key
+from .config import settings
 from sqlalchemy.exc import IntegrityError
 
+# Versions behind the ETags: a counter per table (models.TableVersion) that writes
+# bump before committing, and a version column on single rows, cached with the row.
+def table_version(db: Session, name: str) -> int | None:
+    return db.scalar(select(models.TableVersion.version).where(models.TableVersion.name == name))
+
+def _bump_versions(db: Session, *names: str):
+    db.execute(
+        update(models.TableVersion)
+        .where(models.TableVersion.name.in_(names))
+        .values(version=models.TableVersion.version + 1)
+    )
+
 # Students
 def create_student(db: Session, student: schemas.StudentCreate):
     try:
@@ -9,6 +30,8 @@ def create_student(db: Session, student: schemas.StudentCreate):
         db.add(db_student)
         db.commit()
         db.refresh(db_student)
+        # SQLite can hand out the id of a deleted row again
+        entity_cache.delete(student_key(db_student.id))
         return db_student
     except IntegrityError:
         db.rollback()
@@ -17,14 +40,45 @@ def create_student(db: Session, student: schemas.StudentCreate):
 def get_student(db: Session, student_id: int):
     return db.query(models.Student).filter(models.Student.id == student_id).first()
 
+def get_student_cached(db: Session, student_id: int) -> dict | None:
+    """Read-through cached StudentOut data plus the row's "version"; None if the student doesn't exist."""
+    data = entity_cache.get(student_key(student_id))
+    if data is None:
+        s = get_student(db, student_id)
+        if s is None:
+            return None
+        data = schemas.StudentOut.model_validate(s).model_dump() | {"version": s.version}
+        entity_cache.set(student_key(student_id), data)
+    return data
+
 def delete_student(db: Session, student_id: int) -> bool:
-    s = get_student(db, student_id)
-    if not s:
+    S, E, C = models.Student, models.Enrollment, models.Course
+    # lock the student first: a concurrent enroll waits on its foreign key check,
+    # and a concurrent unenroll waits on the locked enrollment rows and then finds
+    # nothing to delete, so no seat is given back twice or missed
+    if db.scalar(select(S.id).where(S.id == student_id).with_for_update()) is None:
+        db.rollback()
         return False
-    db.delete(s)
+    course_ids = list(db.scalars(select(E.course_id).where(E.student_id == student_id).with_for_update()))
+    if course_ids:
+        # give back the seats held by the enrollments about to be cascaded away
+        db.execute(
+            update(C)
+            .where(C.id.in_(select(E.course_id).where(E.student_id == student_id)))
+            .values(enrolled_count=C.enrolled_count - 1, version=C.version + 1)
+        )
+    # ON DELETE CASCADE removes the enrollments
+    db.execute(delete(S).where(S.id == student_id))
     db.commit()
+    entity_cache.delete(student_key(student_id), *map(course_key, course_ids))
     return True
 
+def bulk_create_students(db: Session, people: list[dict], chunk_size: int | None = None) -> list[tuple[str, int | None]]:
+    outcomes, created = _bulk_create_people(db, models.Student, people, chunk_size)
+    # SQLite can hand out the id of a deleted row again
+    entity_cache.delete(*map(student_key, created))
+    return outcomes
+
 # Teachers
 def create_teacher(db: Session, teacher: schemas.TeacherCreate):
     try:
@@ -37,84 +91,630 @@ def create_teacher(db: Session, teacher: schemas.TeacherCreate):
         db.rollback()
         raise ValueError("Teacher with this email already exists")
 
+def bulk_create_teachers(db: Session, people: list[dict], chunk_size: int | None = None) -> list[tuple[str, int | None]]:
+    return _bulk_create_people(db, models.Teacher, people, chunk_size)[0]
+
 def get_teacher(db: Session, teacher_id: int):
     return db.query(models.Teacher).filter(models.Teacher.id == teacher_id).first()
 
 def delete_teacher(db: Session, teacher_id: int) -> bool:
-    t = get_teacher(db, teacher_id)
-    if not t:
+    course_ids = list(db.scalars(select(models.Course.id).where(models.Course.teacher_id == teacher_id)))
+    # ON DELETE CASCADE removes the courses and their enrollments
+    if not db.execute(delete(models.Teacher).where(models.Teacher.id == teacher_id)).rowcount:
+        db.rollback()
         return False
-    db.delete(t)
     db.commit()
+    entity_cache.delete(*map(course_key, course_ids))
     return True
 
+def _bulk_create_people(db: Session, model, people: list[dict], chunk_size: int | None = None):
+    """Insert students or teachers ({"name", "email"}) whose email is new; returns ((status, id) per row, new ids).
+
+    Emails are checked with one IN query per chunk and the new rows go in as
+    one executemany INSERT; every chunk is its own transaction. A row is
+    "created", "exists" (email already stored; id of that row) or "duplicate"
+    (email used earlier in `people`), so one clash never fails the batch.
+    """
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    outcomes = [None] * len(people)
+    first = {}
+    for i, person in enumerate(people):
+        if person["email"] in first:
+            outcomes[i] = ("duplicate", None)
+        else:
+            first[person["email"]] = i
+    new_ids = []
+    for chunk in _chunks(list(first.items()), chunk_size):
+        stored = dict(db.execute(select(model.email, model.id).where(model.email.in_([e for e, _ in chunk]))).all())
+        fresh = [{"name": people[i]["name"], "email": e} for e, i in chunk if e not in stored]
+        created = _insert_people(db, model, fresh) if fresh else {}
+        db.commit()
+        new_ids.extend(created.values())
+        for email, i in chunk:
+            if email in created:
+                outcomes[i] = ("created", created[email])
+            else:
+                # stored before, or inserted by a concurrent request after the lookup
+                outcomes[i] = ("exists", stored.get(email))
+    return outcomes, new_ids
+
+def _insert_people(db: Session, model, rows: list[dict]) -> dict[str, int]:
+    dialect = db.get_bind().dialect
+    stmt = _insert_ignore_stmt(dialect.name, model.__table__, "email")
+    if dialect.insert_executemany_returning:
+        return dict(db.execute(stmt.returning(model.email, model.id), rows).all())
+    db.execute(stmt, rows)
+    return dict(db.execute(select(model.email, model.id).where(model.email.in_([r["email"] for r in rows]))).all())
+
 # Courses
 def create_course(db: Session, course: schemas.CourseCreate):
     c = models.Course(title=course.title, capacity=course.capacity, teacher_id=course.teacher_id)
     db.add(c)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise ValueError("Teacher not found")
     db.refresh(c)
+    entity_cache.delete(course_key(c.id))
     return c
 
 def get_course(db: Session, course_id: int):
     return db.query(models.Course).filter(models.Course.id == course_id).first()
 
+def get_course_cached(db: Session, course_id: int) -> dict | None:
+    """Read-through cached CourseOut data plus the row's "version"; None if the course doesn't exist."""
+    data = entity_cache.get(course_key(course_id))
+    if data is None:
+        c = get_course(db, course_id)
+        if c is None:
+            return None
+        data = schemas.CourseOut.model_validate(c).model_dump() | {"version": c.version}
+        entity_cache.set(course_key(course_id), data)
+    return data
+
 def delete_course(db: Session, course_id: int) -> bool:
-    c = get_course(db, course_id)
-    if not c:
+    # ON DELETE CASCADE removes the enrollments
+    if not db.execute(delete(models.Course).where(models.Course.id == course_id)).rowcount:
+        db.rollback()
         return False
-    db.delete(c)
     db.commit()
+    entity_cache.delete(course_key(course_id))
     return True
 
 # Enrollment business rules:
-def enroll_student(db: Session, student_id: int, course_id: int):
-    course = get_course(db, course_id)
-    if not course:
-        raise ValueError("Course not found")
-    # capacity check
-    current = db.query(models.Enrollment).filter(models.Enrollment.course_id == course_id).count()
-    if current >= course.capacity:
+def enroll_student(db: Session, student_id: int, course_id: int) -> int:
+    """Take a seat and insert the enrollment in one transaction; returns the enrollment id.
+
+    The conditional UPDATE only matches while enrolled_count < capacity, so
+    concurrent requests can't overbook; uq_student_course rejects duplicates.
+    """
+    reserved = db.execute(
+        update(models.Course)
+        .where(models.Course.id == course_id, models.Course.enrolled_count < models.Course.capacity)
+        .values(enrolled_count=models.Course.enrolled_count + 1, version=models.Course.version + 1)
+    ).rowcount
+    if not reserved:
+        db.rollback()
+        if db.scalar(select(models.Course.id).where(models.Course.id == course_id)) is None:
+            raise ValueError("Course not found")
         raise ValueError("Course is full")
-    # duplicate check
-    existing = db.query(models.Enrollment).filter(models.Enrollment.course_id == course_id, models.Enrollment.student_id == student_id).first()
-    if existing:
+    try:
+        result = db.execute(insert(models.Enrollment).values(student_id=student_id, course_id=course_id))
+        db.commit()
+    except IntegrityError:
+        # also releases the seat taken above
+        db.rollback()
+        if db.scalar(select(models.Student.id).where(models.Student.id == student_id)) is None:
+            raise ValueError("Student not found")
         raise ValueError("Student already enrolled")
-    e = models.Enrollment(student_id=student_id, course_id=course_id)
-    db.add(e)
+    entity_cache.delete(course_key(course_id))
+    return result.inserted_primary_key[0]
+
+def unenroll_student(db: Session, student_id: int, course_id: int) -> bool:
+    removed = db.execute(
+        delete(models.Enrollment).where(models.Enrollment.student_id == student_id, models.Enrollment.course_id == course_id)
+    ).rowcount
+    if not removed:
+        db.rollback()
+        return False
+    db.execute(
+        update(models.Course).where(models.Course.id == course_id)
+        .values(enrolled_count=models.Course.enrolled_count - 1, version=models.Course.version + 1)
+    )
     db.commit()
-    db.refresh(e)
-    return e
+    entity_cache.delete(course_key(course_id))
+    return True
+
+def _reserve_seats(db: Session, course_id: int, wanted: int) -> int:
+    """Take up to `wanted` seats; returns how many were taken.
+
+    The course row is read with a locking SELECT, which returns the latest
+    committed counts (a plain re-read under MySQL's REPEATABLE READ would keep
+    returning the transaction's snapshot) and holds the row until commit, so
+    the UPDATE that follows applies to the counts that were read. SQLite has
+    no FOR UPDATE, and a plain SELECT doesn't start its write transaction, so
+    there a no-op UPDATE of the row takes the database's write lock first.
+    """
+    if not wanted:
+        return 0
+    C = models.Course
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(update(C).where(C.id == course_id).values(enrolled_count=C.enrolled_count))
+    row = db.execute(select(C.capacity, C.enrolled_count).where(C.id == course_id).with_for_update()).one()
+    take = min(wanted, max(0, (row.capacity or 0) - row.enrolled_count))
+    if take:
+        db.execute(update(C).where(C.id == course_id).values(enrolled_count=C.enrolled_count + take, version=C.version + 1))
+    return take
+
+def bulk_enroll(db: Session, course_id: int, student_ids: list[int]) -> list[tuple[int, str]]:
+    """Enroll many students into one course in a single transaction.
+
+    Student ids and existing enrollments are each checked with one IN query per
+    chunk, seats for the whole set are reserved at once, and the new rows go in
+    as one executemany INSERT. Returns (student_id, status) in request order.
+    """
+    if db.scalar(select(models.Course.id).where(models.Course.id == course_id)) is None:
+        raise ValueError("Course not found")
+    unique_ids = list(dict.fromkeys(student_ids))
+    known, enrolled = set(), set()
+    for chunk in _chunks(unique_ids, settings.INGEST_CHUNK_SIZE):
+        known.update(db.scalars(select(models.Student.id).where(models.Student.id.in_(chunk))))
+        enrolled.update(db.scalars(
+            select(models.Enrollment.student_id)
+            .where(models.Enrollment.course_id == course_id, models.Enrollment.student_id.in_(chunk))
+        ))
+    candidates = [sid for sid in unique_ids if sid in known and sid not in enrolled]
+    seats = _reserve_seats(db, course_id, len(candidates))
+    accepted = set(candidates[:seats])
+    if accepted:
+        db.execute(insert(models.Enrollment), [{"student_id": sid, "course_id": course_id} for sid in candidates[:seats]])
+    try:
+        db.commit()
+    except IntegrityError:
+        # someone enrolled one of these students concurrently; nothing was applied
+        db.rollback()
+        raise ValueError("Enrollments changed concurrently, retry the request")
+    entity_cache.delete(course_key(course_id))
+
+    results, reported = [], set()
+    for sid in student_ids:
+        if sid in reported or sid in enrolled:
+            status = "duplicate"
+        elif sid not in known:
+            status = "unknown-student"
+        elif sid in accepted:
+            status = "enrolled"
+        else:
+            status = "no-capacity"
+        reported.add(sid)
+        results.append((sid, status))
+    return results
+
+# Rosters and schedules: each page is a fixed number of column-only queries (the
+# owner row, then the enrollments joined to the other side), so the count doesn't
+# grow with the roster and no ORM objects are built. Pages are keyed on enrollment id.
+def _fetch_dicts(db: Session, q) -> list[dict]:
+    """Run a column-only select on the session's connection and return plain dicts.
+
+    Core execution skips the ORM result pipeline, and zipping against the keys
+    once is much cheaper than building a RowMapping per row.
+    """
+    result = db.connection().execute(q)
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+def _enrollment_page(db: Session, q, limit: int, cursor: str | None):
+    if cursor:
+        after = decode_cursor(cursor).get("id")
+        if not isinstance(after, int):
+            raise ValueError("Invalid cursor")
+        q = q.where(models.Enrollment.id > after)
+    rows = _fetch_dicts(db, q.order_by(models.Enrollment.id).limit(limit + 1))
+    next_cursor = encode_cursor({"id": rows[limit - 1]["enrollment_id"]}) if len(rows) > limit else None
+    items = rows[:limit]
+    for item in items:
+        del item["enrollment_id"]
+    return items, next_cursor
+
+def course_roster(db: Session, course_id: int, limit: int = 50, cursor: str | None = None) -> dict | None:
+    """Return one page of the course's roster as CourseRoster data, or None if the course doesn't exist."""
+    C, E, S = models.Course, models.Enrollment, models.Student
+    course = db.execute(select(C.id, C.title, C.capacity, C.enrolled_count).where(C.id == course_id)).first()
+    if course is None:
+        return None
+    q = (
+        select(E.id.label("enrollment_id"), S.id.label("student_id"), S.name, S.email, E.enrolled_at)
+        .join(S, S.id == E.student_id)
+        .where(E.course_id == course_id)
+    )
+    items, next_cursor = _enrollment_page(db, q, limit, cursor)
+    capacity = course.capacity or 0
+    return {
+        "course_id": course.id,
+        "title": course.title,
+        "capacity": capacity,
+        "seats_used": course.enrolled_count,
+        "seats_available": max(0, capacity - course.enrolled_count),
+        "items": items,
+        "next_cursor": next_cursor,
+    }
+
+def student_schedule(db: Session, student_id: int, limit: int = 50, cursor: str | None = None) -> dict | None:
+    """Return one page of the student's courses as StudentSchedule data, or None if the student doesn't exist."""
+    C, E, S = models.Course, models.Enrollment, models.Student
+    if db.scalar(select(S.id).where(S.id == student_id)) is None:
+        return None
+    q = (
+        select(
+            E.id.label("enrollment_id"), C.id.label("course_id"), C.title, C.teacher_id,
+            func.coalesce(C.capacity, 0).label("capacity"), C.enrolled_count.label("seats_used"), E.enrolled_at,
+        )
+        .join(C, C.id == E.course_id)
+        .where(E.student_id == student_id)
+    )
+    items, next_cursor = _enrollment_page(db, q, limit, cursor)
+    return {"student_id": student_id, "items": items, "next_cursor": next_cursor}
 
 # Import scraped resources:
-def import_scraped(db: Session, items: list[dict]):
-    added = []
+SCRAPED_FIELDS = ("title", "link", "image_url", "price_minor", "currency", "scraped_at")
+
+def _chunks(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+def existing_links(db: Session, links, chunk_size: int | None = None) -> set[str]:
+    """Return the subset of `links` already stored, using one IN query per chunk."""
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    found = set()
+    for chunk in _chunks(list(links), chunk_size):
+        found.update(db.scalars(select(models.ScrapedResource.link).where(models.ScrapedResource.link.in_(chunk))))
+    return found
+
+def iter_scraped_links(db: Session, batch: int = 10000):
+    """Stream every stored link without loading the whole column at once."""
+    yield from db.scalars(select(models.ScrapedResource.link).execution_options(yield_per=batch))
+
+def _insert_ignore_stmt(dialect_name: str, table=None, key: str = "link"):
+    # a concurrent importer may insert the same key between our lookup and insert
+    table = models.ScrapedResource.__table__ if table is None else table
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(table).on_conflict_do_nothing(index_elements=[key])
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).on_conflict_do_nothing(index_elements=[key])
+    if dialect_name in ("mysql", "mariadb"):
+        # not INSERT IGNORE, which also turns data errors into warnings and stores truncated rows;
+        # setting the key to itself skips only the rows whose unique key is taken
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        return mysql_insert(table).on_duplicate_key_update({key: table.c[key]})
+    return insert(table)
+
+def _insert_scraped_rows(db: Session, rows: list[dict]) -> list[tuple[int, str]]:
+    # returns (id, link) of the inserted rows
+    SR = models.ScrapedResource
+    dialect = db.get_bind().dialect
+    stmt = _insert_ignore_stmt(dialect.name)
+    if dialect.insert_executemany_returning:
+        return [tuple(r) for r in db.execute(stmt.returning(SR.id, SR.link), rows)]
+    db.execute(stmt, rows)
+    # no RETURNING (e.g. MySQL): read the ids back with one query for the chunk
+    links = [r["link"] for r in rows]
+    return [tuple(r) for r in db.execute(select(SR.id, SR.link).where(SR.link.in_(links)))]
+
+def _delete_scraped_rows(db: Session, ids) -> int:
+    """DELETE ... IN `ids`, logging a delete change for each row that was there; returns rows deleted."""
+    SR = models.ScrapedResource
+    _lock_change_feed(db)
+    stmt = delete(SR).where(SR.id.in_(ids))
+    if db.get_bind().dialect.delete_returning:
+        rows = db.execute(stmt.returning(SR.id, SR.link)).all()
+    else:
+        rows = db.execute(select(SR.id, SR.link).where(SR.id.in_(ids))).all()
+        db.execute(stmt)
+    _log_scraped_changes(db, CHANGE_DELETE, rows)
+    return len(rows)
+
+def bulk_insert_scraped(db: Session, items, chunk_size: int | None = None) -> list[int]:
+    """Insert scraped items whose link is not stored yet and return the new ids.
+
+    Links are deduped inside the batch, then against the table one chunk at a
+    time; each chunk is a single executemany INSERT.
+    """
+    new_ids = _insert_new_scraped(db, items, chunk_size)
+    db.commit()
+    if new_ids:
+        notifier.notify()
+    return new_ids
+
+def _insert_new_scraped(db: Session, items, chunk_size: int | None = None) -> list[int]:
+    # bulk_insert_scraped without the commit
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    rows = {}
     for it in items:
-        # skip if link exists
-        if db.query(models.ScrapedResource).filter(models.ScrapedResource.link == it.get("link")).first():
+        link = it.get("link")
+        if not link or link in rows:
             continue
-        sr = models.ScrapedResource(
-            title = it.get("title"),
-            link = it.get("link"),
-            image_url = it.get("image_url"),
-            price = it.get("price"),
-            scraped_at = it.get("scraped_at")
-        )
-        db.add(sr)
-        added.append(sr)
+        rows[link] = {f: it.get(f) for f in SCRAPED_FIELDS}
+    new_ids = []
+    for chunk in _chunks(list(rows.values()), chunk_size):
+        known = existing_links(db, [r["link"] for r in chunk], chunk_size)
+        fresh = [r for r in chunk if r["link"] not in known]
+        if fresh:
+            _lock_change_feed(db)
+            inserted = _insert_scraped_rows(db, fresh)
+            _log_scraped_changes(db, CHANGE_INSERT, inserted)
+            new_ids.extend(pid for pid, _ in inserted)
+    return new_ids
+
+def import_scraped(db: Session, items: list[dict]) -> list[int]:
+    return bulk_insert_scraped(db, items)
+
+# Background import jobs (run by jobs.JobRunner)
+def create_import_job(db: Session, payload: str, total: int) -> models.ImportJob:
+    job = models.ImportJob(status="queued", payload=payload, total=total, created_at=utcnow())
+    db.add(job)
     db.commit()
-    # refresh to get ids
-    for a in added:
-        db.refresh(a)
-    return added
+    db.refresh(job)
+    return job
+
+def get_import_job(db: Session, job_id: int):
+    return db.get(models.ImportJob, job_id)
+
+def import_job_chunk(db: Session, job: models.ImportJob, items: list[dict], owner: str) -> bool:
+    """Insert one chunk of a job's items and commit it together with the job's counters and a renewed lease.
+
+    Returns False, writing nothing, once `owner` no longer holds the job.
+    """
+    Job = models.ImportJob
+    # renewing first also locks the job row until the commit, so the lease can't be taken over mid-chunk
+    held = db.execute(
+        update(Job).where(Job.id == job.id, Job.owner == owner, Job.status == "running").values(heartbeat_at=utcnow())
+    ).rowcount
+    if not held:
+        db.rollback()
+        return False
+    new_ids = _insert_new_scraped(db, items)
+    job.processed += len(items)
+    job.accepted += len(new_ids)
+    job.duplicate += len(items) - len(new_ids)
+    db.commit()
+    if new_ids:
+        notifier.notify()
+    return True
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
-def list_scraped(db: Session, skip=0, limit=100):
-    return db.query(models.ScrapedResource).offset(skip).limit(limit).all()
+# Keyset pagination: the cursor is an opaque token wrapping the last row's key
+def encode_cursor(key: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, dict):
+        raise ValueError("Invalid cursor")
+    return key
+
+def _scraped_columns():
+    # the ScrapedResourceOut keys; read paths select these instead of whole ORM objects
+    SR = models.ScrapedResource
+    return (SR.id, SR.title, SR.link, SR.image_url, SR.price_minor, SR.currency, SR.scraped_at)
+
+# sort name -> (column, descending); rows where the column is NULL are left out of
+# price/date orderings so the keyset comparison stays a plain (value, id) tuple
+SCRAPED_SORTS = {
+    "id": (None, False),
+    "price": ("price_minor", False),
+    "-price": ("price_minor", True),
+    "scraped_at": ("scraped_at", False),
+    "-scraped_at": ("scraped_at", True),
+}
+
+def list_scraped(db: Session, limit: int = 50, cursor: str | None = None,
+                 scraped_from: datetime | None = None, scraped_to: datetime | None = None,
+                 min_price: int | None = None, max_price: int | None = None, sort: str = "id"):
+    """Return one page of scraped resources (ScrapedResourceOut dicts) in `sort` order, plus the next cursor.
+
+    Prices are in minor units. The cursor carries the last row's (sort value, id).
+    """
+    SR = models.ScrapedResource
+    if sort not in SCRAPED_SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SCRAPED_SORTS)}")
+    name, desc = SCRAPED_SORTS[sort]
+    col = getattr(SR, name) if name else None
+    q = select(*_scraped_columns())
+    if scraped_from:
+        q = q.where(SR.scraped_at >= scraped_from)
+    if scraped_to:
+        q = q.where(SR.scraped_at < scraped_to)
+    if min_price is not None:
+        q = q.where(SR.price_minor >= min_price)
+    if max_price is not None:
+        q = q.where(SR.price_minor <= max_price)
+    if cursor:
+        key = decode_cursor(cursor)
+        after = key.get("id")
+        if not isinstance(after, int) or key.get("sort", "id") != sort:
+            raise ValueError("Invalid cursor")
+        if col is None:
+            q = q.where(SR.id > after)
+        else:
+            value = key.get("value")
+            if name == "scraped_at":
+                try:
+                    value = datetime.fromisoformat(value)
+                except (TypeError, ValueError):
+                    raise ValueError("Invalid cursor")
+            elif not isinstance(value, int):
+                raise ValueError("Invalid cursor")
+            if desc:
+                q = q.where(or_(col < value, and_(col == value, SR.id < after)))
+            else:
+                q = q.where(or_(col > value, and_(col == value, SR.id > after)))
+    if col is None:
+        q = q.order_by(SR.id)
+    else:
+        q = q.where(col.is_not(None))
+        q = q.order_by(col.desc(), SR.id.desc()) if desc else q.order_by(col, SR.id)
+    rows = _fetch_dicts(db, q.limit(limit + 1))
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        key = {"id": last["id"]}
+        if col is not None:
+            value = last[name]
+            key.update(sort=sort, value=value.isoformat() if isinstance(value, datetime) else value)
+        next_cursor = encode_cursor(key)
+    return rows[:limit], next_cursor
+
+def search_scraped(db: Session, q: str, limit: int = 50, cursor: str | None = None):
+    """Return one page of scraped resources (dicts) whose title matches `q`, best match first, plus the next cursor.
+
+    Pages are keyed on (rank, id): rank is FTS5's bm25 score on SQLite and the
+    negated MATCH relevance on MySQL (lower is better on both). Other dialects
+    filter with column.match() and page by id.
+    """
+    SR = models.ScrapedResource
+    kind = search.strategy(db.get_bind().dialect.name)
+    if kind == "fts5":
+        fts = table(search.FTS_TABLE, column("rowid"))
+        # rank and page inside the FTS table, then join only the page's rows
+        qry = select(fts.c.rowid.label("id"), func.bm25(literal_column(search.FTS_TABLE)).label("rank")).where(
+            literal_column(search.FTS_TABLE).op("MATCH")(search.fts5_query(q)))
+        id_col, rank = fts.c.rowid, func.bm25(literal_column(search.FTS_TABLE))
+    elif kind == "fulltext":
+        relevance = mysql_match(SR.title, against=q).in_natural_language_mode()
+        qry = select(SR.id, (-relevance).label("rank")).where(relevance)
+        id_col, rank = SR.id, -relevance
+    else:
+        qry = select(SR.id).where(SR.title.match(q))
+        id_col, rank = SR.id, None
+    if cursor:
+        key = decode_cursor(cursor)
+        after, after_rank = key.get("id"), key.get("rank")
+        if not isinstance(after, int) or (rank is not None and not isinstance(after_rank, (int, float))):
+            raise ValueError("Invalid cursor")
+        if rank is None:
+            qry = qry.where(id_col > after)
+        else:
+            qry = qry.where(or_(rank > after_rank, and_(rank == after_rank, id_col > after)))
+    order = (id_col,) if rank is None else (rank, id_col)
+    hits = db.execute(qry.order_by(*order).limit(limit + 1)).all()
+    page = _fetch_dicts(db, select(*_scraped_columns()).where(SR.id.in_([h.id for h in hits[:limit]])))
+    by_id = {row["id"]: row for row in page}
+    next_cursor = None
+    if len(hits) > limit:
+        last = hits[limit - 1]
+        next_cursor = encode_cursor({"id": last.id} if rank is None else {"id": last.id, "rank": last.rank})
+    return [by_id[h.id] for h in hits[:limit] if h.id in by_id], next_cursor
 
 def delete_scraped(db: Session, scraped_id: int) -> bool:
-    row = db.query(models.ScrapedResource).filter(models.ScrapedResource.id == scraped_id).first()
-    if not row:
+    if not _delete_scraped_rows(db, [scraped_id]):
+        db.rollback()
         return False
-    db.delete(row)
     db.commit()
+    notifier.notify()
     return True
+
+def delete_scraped_ids(db: Session, ids, chunk_size: int | None = None) -> int:
+    """Delete scraped resources by id, one DELETE ... IN per chunk, in one transaction; returns rows deleted."""
+    ids = list(dict.fromkeys(ids))
+    deleted = 0
+    for chunk in _chunks(ids, chunk_size or settings.INGEST_CHUNK_SIZE):
+        deleted += _delete_scraped_rows(db, chunk)
+    if not deleted:
+        # nothing changed; don't move the version
+        db.rollback()
+        return 0
+    db.commit()
+    notifier.notify()
+    return deleted
+
+def purge_scraped_before(db: Session, before: datetime, batch_size: int | None = None) -> int:
+    """Delete scraped resources with scraped_at < `before`, committing every batch; returns rows deleted.
+
+    Each batch is one DELETE ... IN over the next `batch_size` matching ids
+    (MySQL can't LIMIT a subquery on the table being deleted from), so a large
+    purge holds the write lock for one batch at a time instead of the whole run.
+    """
+    batch_size = batch_size or settings.INGEST_CHUNK_SIZE
+    matching = (
+        select(models.ScrapedResource.id)
+        .where(models.ScrapedResource.scraped_at < before)
+        .limit(batch_size)
+    )
+    deleted = 0
+    while True:
+        ids = list(db.scalars(matching))
+        if ids:
+            deleted += _delete_scraped_rows(db, ids)
+            db.commit()
+            notifier.notify()
+        if len(ids) < batch_size:
+            return deleted
+
+# Change feed (models.ScrapedChange). The cursor wraps the last seq a consumer has
+# seen, so the feed must never commit a seq below one a reader may already have
+# passed. seq is assigned at INSERT, not at commit; every transaction that writes
+# scraped_resources therefore takes the row lock on its table_versions counter
+# first (_lock_change_feed) and keeps it until commit. Feed writers run one at a
+# time, each allocating seqs only while it holds the lock, so the committed seqs
+# are always a prefix of the allocated ones, on PostgreSQL and MySQL as on SQLite
+# (where the database write lock already serializes them). Gaps left by
+# rolled-back transactions are skipped.
+CHANGE_INSERT, CHANGE_DELETE = "insert", "delete"
+
+def _lock_change_feed(db: Session) -> None:
+    # the bump is also what moves the /scraped_resources ETag; call it before the
+    # resource rows are written so writers always lock in the same order
+    _bump_versions(db, "scraped_resources")
+
+def _log_scraped_changes(db: Session, op: str, rows) -> None:
+    # rows are (id, link) pairs; written in the caller's transaction. A Core
+    # executemany on the connection costs about half of the ORM bulk insert.
+    if rows:
+        now = utcnow()
+        db.connection().execute(models.ScrapedChange.__table__.insert(), [
+            {"op": op, "resource_id": pid, "link": link, "changed_at": now} for pid, link in rows
+        ])
+
+def change_cursor(seq: int) -> str:
+    return encode_cursor({"seq": seq})
+
+def change_seq(cursor: str) -> int:
+    seq = decode_cursor(cursor).get("seq")
+    if not isinstance(seq, int) or seq < 0:
+        raise ValueError("Invalid cursor")
+    return seq
+
+def latest_change_seq(db: Session) -> int:
+    return db.scalar(select(func.max(models.ScrapedChange.seq))) or 0
+
+def scraped_changes(db: Session, after: int = 0, limit: int = 100) -> list[dict]:
+    """Return up to `limit` changes (ScrapedChange dicts) with seq > `after`, oldest first.
+
+    An insert carries the resource as it is now, or None if it has been
+    deleted since (its delete comes later in the feed).
+    """
+    C, SR = models.ScrapedChange, models.ScrapedResource
+    q = (
+        select(C.seq, C.op, C.resource_id, C.link, C.changed_at, *_scraped_columns())
+        # the link check stops a reused id from matching a different resource
+        .outerjoin(SR, and_(C.op == CHANGE_INSERT, SR.id == C.resource_id, SR.link == C.link))
+        .where(C.seq > after)
+        .order_by(C.seq)
+        .limit(limit)
+    )
+    keys = [c.key for c in _scraped_columns()]
+    changes = []
+    for seq, op, resource_id, link, changed_at, *item in db.connection().execute(q):
+        changes.append({
+            "seq": seq, "op": op, "id": resource_id, "link": link, "changed_at": changed_at,
+            "resource": dict(zip(keys, item)) if item[0] is not None else None,
+        })
+    return changes
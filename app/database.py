@@ -1,15 +1,114 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
 from .config import settings
+from .metrics import record_query
 
-connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
-    # Needed for SQLite when used in multithreaded contexts (e.g., TestClient)
-    connect_args = {"check_same_thread": False}
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, future=True, connect_args=connect_args)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record_query(time.perf_counter() - context._query_started)
+
+def instrument_engine(engine):
+    """Count and time every statement against the current request (see app.metrics)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def _sqlite_foreign_keys(dbapi_conn, record):
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA foreign_keys=ON")
+    cur.close()
+
+def enable_sqlite_foreign_keys(engine):
+    """SQLite ignores foreign keys, including ON DELETE CASCADE, unless each connection turns them on."""
+    event.listen(engine, "connect", _sqlite_foreign_keys)
+
+# SQLite "performance" profile: WAL lets readers run alongside the writer,
+# and all writes go through one pooled connection that starts its
+# transactions with BEGIN IMMEDIATE, so writers queue on the pool instead of
+# failing with "database is locked" when a read lock can't be upgraded.
+
+def _sqlite_pragmas(readonly: bool):
+    def on_connect(dbapi_conn, record):
+        # let SQLAlchemy's "begin" event decide how transactions start
+        dbapi_conn.isolation_level = None
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cur.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        # negative cache_size is in KiB
+        cur.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KIB)}")
+        if readonly:
+            cur.execute("PRAGMA query_only=ON")
+        cur.close()
+    return on_connect
+
+def create_db_engine(url: str, profile: str = "default", role: str = "writer"):
+    """Engine for `url`; with the SQLite performance profile, `role` picks the reader pool or the single writer."""
+    kwargs = {"pool_pre_ping": True, "future": True}
+    tuned = url.startswith("sqlite") and profile == "performance"
+    if url.startswith("sqlite"):
+        # Needed for SQLite when used in multithreaded contexts (e.g., TestClient)
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if tuned:
+        if role == "writer":
+            kwargs.update(pool_size=1, max_overflow=0, pool_timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000)
+        else:
+            kwargs.update(pool_size=settings.SQLITE_READ_POOL_SIZE, max_overflow=0)
+    engine = create_engine(url, **kwargs)
+    if url.startswith("sqlite"):
+        enable_sqlite_foreign_keys(engine)
+    if tuned:
+        event.listen(engine, "connect", _sqlite_pragmas(readonly=role == "reader"))
+        begin = "BEGIN IMMEDIATE" if role == "writer" else "BEGIN"
+        event.listen(engine, "begin", lambda conn: conn.exec_driver_sql(begin))
+    instrument_engine(engine)
+    return engine
+
+class RoutingSession(Session):
+    """Reads use the reader pool until the session first writes; after that the session sticks to the writer.
+
+    Sticking keeps read-your-writes (e.g. the refresh after commit) and keeps a
+    writer from waiting on a reader pool that busy readers have drained. A
+    SELECT ... FOR UPDATE counts as a write: it reads in the writer's
+    transaction (BEGIN IMMEDIATE), so what it returns can't change before the
+    session's UPDATE.
+    """
+
+    def __init__(self, *args, writer=None, reader=None, **kw):
+        super().__init__(*args, **kw)
+        self.writer = writer
+        self.reader = reader
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        locking = getattr(clause, "_for_update_arg", None) is not None
+        if self._flushing or isinstance(clause, UpdateBase) or locking or self.info.get("wrote"):
+            self.info["wrote"] = True
+            return self.writer
+        return self.reader
+
+    def close(self):
+        super().close()
+        self.info.pop("wrote", None)
+
+def make_session_factory(url: str, profile: str = "default"):
+    """Return (write engine, read engine, sessionmaker) for a database URL and profile."""
+    if url.startswith("sqlite") and profile == "performance":
+        writer = create_db_engine(url, profile, "writer")
+        reader = create_db_engine(url, profile, "reader")
+        factory = sessionmaker(class_=RoutingSession, writer=writer, reader=reader, autocommit=False, autoflush=False)
+        return writer, reader, factory
+    engine = create_db_engine(url, profile)
+    return engine, engine, sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+engine, read_engine, SessionLocal = make_session_factory(settings.DATABASE_URL, settings.SQLITE_PROFILE)
 Base = declarative_base()
 
 def init_db():
+    # models registers the tables on Base.metadata
+    from . import migrations, models  # noqa: F401
     Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
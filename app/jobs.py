@@ -0,0 +1,135 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, update
+from . import crud, models, schemas
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Background imports: POST /import/scraped?async=true stores the items as an
+# import_jobs row and returns 202; a fixed pool of threads, started and stopped
+# by the app lifespan, works through them one chunk (INGEST_CHUNK_SIZE items,
+# one transaction) at a time. Jobs live in the database, so on startup the
+# queued ones are picked up again and interrupted ones continue after their
+# last committed chunk.
+#
+# Several processes (uvicorn --workers N, a rolling restart) share the table. A
+# running job carries its runner's `owner` id and a `heartbeat_at` lease renewed
+# with every chunk; only a job whose lease has run out for IMPORT_JOB_LEASE_SECONDS
+# is taken over, and a chunk only commits while its runner still holds the lease.
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+class JobRunner:
+    def __init__(self, session_factory=SessionLocal, workers: int = 2, chunk_size: int | None = None,
+                 lease_seconds: float = 60.0):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.pool = None
+        self.watcher = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        """Start the pool, queue every unfinished job and watch for jobs whose runner went away."""
+        self.stopping.clear()
+        self.pool = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="import-job")
+        self.requeue_expired()
+        with self.session_factory() as db:
+            pending = list(db.scalars(
+                select(models.ImportJob.id).where(models.ImportJob.status == QUEUED).order_by(models.ImportJob.id)
+            ))
+        for job_id in pending:
+            self.submit(job_id)
+        self.watcher = threading.Thread(target=self._watch, name="import-job-lease", daemon=True)
+        self.watcher.start()
+
+    def stop(self, wait: bool = True):
+        """Stop after the chunk each worker is on; unfinished jobs stay queued for the next start."""
+        self.stopping.set()
+        if self.watcher is not None:
+            self.watcher.join()
+            self.watcher = None
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait, cancel_futures=True)
+            self.pool = None
+
+    def _watch(self):
+        while not self.stopping.wait(self.lease_seconds / 2):
+            try:
+                for job_id in self.requeue_expired():
+                    self.submit(job_id)
+            except Exception:
+                logger.exception("import job lease check failed")
+
+    def requeue_expired(self) -> list[int]:
+        """Queue again the running jobs whose lease ran out (their process died); returns their ids."""
+        Job = models.ImportJob
+        expired = (Job.status == RUNNING) & (
+            Job.heartbeat_at.is_(None) | (Job.heartbeat_at < crud.utcnow() - timedelta(seconds=self.lease_seconds))
+        )
+        requeued = []
+        with self.session_factory() as db:
+            for job_id in db.scalars(select(Job.id).where(expired).order_by(Job.id)):
+                # conditional, so a runner that renewed the lease meanwhile keeps its job
+                if db.execute(update(Job).where(Job.id == job_id, expired).values(status=QUEUED, owner=None)).rowcount:
+                    requeued.append(job_id)
+            db.commit()
+        return requeued
+
+    def submit(self, job_id: int) -> bool:
+        """Hand a queued job to the pool; False when the runner isn't started (start() will pick it up)."""
+        if self.pool is None:
+            return False
+        self.pool.submit(self.run, job_id)
+        return True
+
+    def run(self, job_id: int):
+        with self.session_factory() as db:
+            # claim with a conditional UPDATE, so a job submitted twice runs once
+            claimed = db.execute(
+                update(models.ImportJob)
+                .where(models.ImportJob.id == job_id, models.ImportJob.status == QUEUED)
+                .values(status=RUNNING, owner=self.owner, heartbeat_at=crud.utcnow())
+            ).rowcount
+            db.commit()
+            if not claimed:
+                return
+            job = crud.get_import_job(db, job_id)
+            job.started_at = job.started_at or crud.utcnow()
+            try:
+                items = [it.model_dump() for it in schemas.SCRAPED_ITEMS.validate_json(job.payload)]
+                chunk_size = self.chunk_size or settings.INGEST_CHUNK_SIZE
+                while job.processed < job.total:
+                    if self.stopping.is_set():
+                        self._release(db, job_id, status=QUEUED)
+                        return
+                    if not crud.import_job_chunk(db, job, items[job.processed:job.processed + chunk_size], self.owner):
+                        logger.warning("import job %s was taken over by another runner", job_id)
+                        return
+            except Exception as e:
+                logger.exception("import job %s failed", job_id)
+                db.rollback()
+                self._release(db, job_id, status=FAILED, error=str(e), finished_at=crud.utcnow())
+            else:
+                # the items are in scraped_resources now
+                self._release(db, job_id, status=DONE, payload=None, finished_at=crud.utcnow())
+
+    def _release(self, db, job_id: int, **values):
+        # only while this runner still holds the job; a runner that took it over decides its fate
+        db.execute(
+            update(models.ImportJob)
+            .where(models.ImportJob.id == job_id, models.ImportJob.owner == self.owner, models.ImportJob.status == RUNNING)
+            .values(owner=None, **values)
+        )
+        db.commit()
+
+runner = JobRunner(workers=settings.IMPORT_JOB_WORKERS, lease_seconds=settings.IMPORT_JOB_LEASE_SECONDS)
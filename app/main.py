@@ -1,14 +1,44 @@
+import logging
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from . import jobs, metrics
+from .config import settings
 from .database import init_db
 from .routes import router
 
+logger = logging.getLogger(__name__)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
+    jobs.runner.start()
     yield
-    # Shutdown (if needed)
+    # Shutdown: workers finish their current chunk, the rest of their jobs stays queued
+    jobs.runner.stop()
 
 app = FastAPI(title="SMS (simple)", lifespan=lifespan)
 app.include_router(router)
+
+@app.middleware("http")
+async def sql_metrics(request: Request, call_next):
+    stats = metrics.RequestStats()
+    token = metrics.current_request.set(stats)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.current_request.reset(token)
+    elapsed = time.perf_counter() - start
+    # label by route template, not raw path, to keep the series count bounded
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    metrics.observe_request(request.method, path, response.status_code, elapsed, stats)
+    if settings.SQL_DEBUG_HEADERS:
+        response.headers["X-DB-Query-Count"] = str(stats.queries)
+        response.headers["X-DB-Time-Ms"] = f"{stats.db_time * 1000:.2f}"
+    threshold = settings.QUERY_COUNT_WARN_THRESHOLD
+    if threshold and stats.queries > threshold:
+        logger.warning("%s %s ran %d SQL queries (threshold %d), possible N+1", request.method, path, stats.queries, threshold)
+    return response
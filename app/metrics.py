@@ -0,0 +1,81 @@
+import contextvars
+import threading
+
+# Per-request SQL counters. The HTTP middleware in main.py sets a fresh
+# RequestStats for each request; the engine hooks in database.py add to it.
+
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+current_request: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("current_request", default=None)
+
+def record_query(elapsed: float) -> None:
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+class Histogram:
+    """Minimal Prometheus histogram with labels, rendered in the text exposition format."""
+
+    def __init__(self, name: str, help: str, buckets, labelnames):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        with self.lock:
+            row = self.series.get(labels)
+            if row is None:
+                row = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for labels, row in sorted(self.series.items()):
+                base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+                sep = "," if base else ""
+                for bound, count in zip(self.buckets, row):
+                    lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound:g}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {row[-1]}')
+                lines.append(f"{self.name}_sum{{{base}}} {row[-2]:.6f}")
+                lines.append(f"{self.name}_count{{{base}}} {row[-1]}")
+        return lines
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by route.", SECONDS_BUCKETS, ("method", "route", "status"))
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request.", QUERY_BUCKETS, ("method", "route"))
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per request.", SECONDS_BUCKETS, ("method", "route"))
+
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_DB_TIME)
+
+def observe_request(method: str, route: str, status: int, elapsed: float, stats: RequestStats) -> None:
+    REQUEST_DURATION.observe(elapsed, method, route, str(status))
+    REQUEST_QUERIES.observe(stats.queries, method, route)
+    REQUEST_DB_TIME.observe(stats.db_time, method, route)
+
+def render() -> str:
+    lines = []
+    for h in HISTOGRAMS:
+        lines.extend(h.render())
+    return "\n".join(lines) + "\n"
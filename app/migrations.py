@@ -0,0 +1,189 @@
+from sqlalchemy import DateTime, Integer, String, bindparam, inspect, select, text, update
+from sqlalchemy.sql import column, table
+from sqlalchemy.schema import AddConstraint
+
+# Tables are created with create_all(), which never alters an existing table.
+# These steps bring databases created by older versions up to the current models.
+
+def _columns(conn, table: str) -> set[str]:
+    insp = inspect(conn)
+    if not insp.has_table(table):
+        return set()
+    return {c["name"] for c in insp.get_columns(table)}
+
+def add_course_enrolled_count(conn):
+    cols = _columns(conn, "courses")
+    if not cols or "enrolled_count" in cols:
+        return
+    conn.execute(text("ALTER TABLE courses ADD COLUMN enrolled_count INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text(
+        "UPDATE courses SET enrolled_count = "
+        "(SELECT COUNT(*) FROM enrollments WHERE enrollments.course_id = courses.id)"
+    ))
+
+def _stale_foreign_keys(conn, table) -> list[dict]:
+    """Foreign keys of `table` in the database whose ON DELETE doesn't match the model."""
+    if not inspect(conn).has_table(table.name):
+        return []
+    wanted = {tuple(fk.column_keys): (fk.ondelete or "").upper() for fk in table.foreign_key_constraints}
+    return [
+        fk for fk in inspect(conn).get_foreign_keys(table.name)
+        if tuple(fk["constrained_columns"]) in wanted
+        and (fk.get("options") or {}).get("ondelete", "").upper() != wanted[tuple(fk["constrained_columns"])]
+    ]
+
+def _rebuild_sqlite_table(conn, table):
+    """SQLite can't alter constraints: recreate `table` from the model and copy the rows across."""
+    cols = ", ".join(f'"{c}"' for c in sorted(_columns(conn, table.name) & set(table.columns.keys())))
+    for index in inspect(conn).get_indexes(table.name):
+        conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+    # triggers would follow the renamed table and then be dropped with it; create() adds them back
+    triggers = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :t"), {"t": table.name})
+    for (trigger,) in triggers.all():
+        conn.execute(text(f'DROP TRIGGER "{trigger}"'))
+    # keep other tables' REFERENCES pointing at the original name
+    conn.execute(text("PRAGMA legacy_alter_table=ON"))
+    conn.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{table.name}_old"'))
+    conn.execute(text("PRAGMA legacy_alter_table=OFF"))
+    table.create(conn)
+    conn.execute(text(f'INSERT INTO "{table.name}" ({cols}) SELECT {cols} FROM "{table.name}_old"'))
+    conn.execute(text(f'DROP TABLE "{table.name}_old"'))
+
+def cascade_foreign_keys(conn):
+    from .database import Base
+    # parents first, so a rebuilt child never references a table that is about to be renamed
+    for name in ("courses", "enrollments"):
+        table = Base.metadata.tables[name]
+        stale = _stale_foreign_keys(conn, table)
+        if not stale:
+            continue
+        if conn.dialect.name == "sqlite":
+            _rebuild_sqlite_table(conn, table)
+            continue
+        drop = "FOREIGN KEY" if conn.dialect.name in ("mysql", "mariadb") else "CONSTRAINT"
+        for fk in stale:
+            conn.execute(text(f"ALTER TABLE {name} DROP {drop} {fk['name']}"))
+            for constraint in table.foreign_key_constraints:
+                if list(constraint.column_keys) == fk["constrained_columns"]:
+                    conn.execute(AddConstraint(constraint))
+
+def create_search_index(conn):
+    from .search import ensure_index
+    ensure_index(conn)
+
+def _backfill_scraped_values(conn, cols, batch_size):
+    """Fill price_minor/currency from the old price text and rewrite scraped_at as a real datetime, `batch_size` rows at a time."""
+    from .schemas import LEGACY_CURRENCY, parse_price, parse_scraped_at
+    old = table("scraped_resources", *(column(c, String) for c in ("price", "scraped_at") if c in cols))
+    old.append_column(column("id", Integer))
+    new = table(
+        "scraped_resources", column("id", Integer), column("price_minor", Integer),
+        column("currency", String), column("scraped_at", DateTime),
+    )
+    stmt = (
+        update(new).where(new.c.id == bindparam("row_id"))
+        .values(price_minor=bindparam("p"), currency=bindparam("c"), scraped_at=bindparam("s"))
+    )
+    last = 0
+    while True:
+        rows = conn.execute(select(old).where(old.c.id > last).order_by(old.c.id).limit(batch_size)).all()
+        if not rows:
+            return
+        params = []
+        for row in rows:
+            minor, currency = parse_price(row._mapping.get("price"), LEGACY_CURRENCY)
+            try:
+                scraped_at = parse_scraped_at(row._mapping.get("scraped_at"))
+            except ValueError:
+                scraped_at = None
+            params.append({"row_id": row.id, "p": minor, "c": currency, "s": scraped_at})
+        conn.execute(stmt, params)
+        last = rows[-1].id
+
+def type_scraped_columns(conn, batch_size=5000):
+    """price (text) -> price_minor + currency, and scraped_at text -> DateTime; price_minor is indexed here, scraped_at by index_scraped_at."""
+    from .database import Base
+    from .search import rebuild
+    cols = _columns(conn, "scraped_resources")
+    if not cols or "price_minor" in cols:
+        return
+    dialect = conn.dialect.name
+    conn.execute(text("ALTER TABLE scraped_resources ADD COLUMN price_minor INTEGER"))
+    conn.execute(text("ALTER TABLE scraped_resources ADD COLUMN currency VARCHAR(3)"))
+    if "scraped_at" not in cols:
+        conn.execute(text(f"ALTER TABLE scraped_resources ADD COLUMN scraped_at {DateTime().compile(dialect=conn.dialect)}"))
+    _backfill_scraped_values(conn, cols, batch_size)
+    if dialect == "sqlite":
+        # recreates the table with the model's types and indexes and leaves the old price column behind
+        _rebuild_sqlite_table(conn, Base.metadata.tables["scraped_resources"])
+        rebuild(conn)
+        return
+    if "scraped_at" in cols and dialect == "postgresql":
+        conn.execute(text(
+            "ALTER TABLE scraped_resources ALTER COLUMN scraped_at TYPE TIMESTAMP "
+            "USING NULLIF(scraped_at, '')::timestamp"
+        ))
+    elif "scraped_at" in cols:
+        conn.execute(text("UPDATE scraped_resources SET scraped_at = NULL WHERE scraped_at = ''"))
+        conn.execute(text("ALTER TABLE scraped_resources MODIFY COLUMN scraped_at DATETIME NULL"))
+    if "price" in cols:
+        conn.execute(text("ALTER TABLE scraped_resources DROP COLUMN price"))
+    conn.execute(text("CREATE INDEX ix_scraped_resources_price_minor ON scraped_resources (price_minor)"))
+
+def index_scraped_at(conn):
+    # the keyset page filters on scraped_at; databases created before it was indexed never got the index
+    if not _columns(conn, "scraped_resources"):
+        return
+    if "ix_scraped_resources_scraped_at" not in {i["name"] for i in inspect(conn).get_indexes("scraped_resources")}:
+        conn.execute(text("CREATE INDEX ix_scraped_resources_scraped_at ON scraped_resources (scraped_at)"))
+
+def create_table_versions(conn):
+    # create_all() makes it too; upgrade() on its own must leave a database crud can write to
+    from .models import TableVersion
+    TableVersion.__table__.create(conn, checkfirst=True)
+
+def add_row_versions(conn):
+    # ETag versions of students and courses; existing rows start at 0
+    for name in ("students", "courses"):
+        cols = _columns(conn, name)
+        if cols and "version" not in cols:
+            conn.execute(text(f"ALTER TABLE {name} ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+
+def create_scraped_changes(conn):
+    # starts empty: rows stored before the feed existed are only in GET /scraped_resources
+    from .models import ScrapedChange
+    ScrapedChange.__table__.create(conn, checkfirst=True)
+
+def add_import_job_lease(conn):
+    cols = _columns(conn, "import_jobs")
+    if not cols or "owner" in cols:
+        return
+    conn.execute(text("ALTER TABLE import_jobs ADD COLUMN owner VARCHAR(64)"))
+    conn.execute(text(f"ALTER TABLE import_jobs ADD COLUMN heartbeat_at {DateTime().compile(dialect=conn.dialect)}"))
+
+def widen_import_job_payload(conn):
+    # import_jobs.payload was created as TEXT (64 KB) on MySQL
+    if conn.dialect.name not in ("mysql", "mariadb") or "payload" not in _columns(conn, "import_jobs"):
+        return
+    col = next(c for c in inspect(conn).get_columns("import_jobs") if c["name"] == "payload")
+    if type(col["type"]).__name__ != "LONGTEXT":
+        conn.execute(text("ALTER TABLE import_jobs MODIFY COLUMN payload LONGTEXT"))
+
+STEPS = [
+    add_course_enrolled_count, cascade_foreign_keys, create_search_index, type_scraped_columns, index_scraped_at,
+    create_table_versions, create_scraped_changes, widen_import_job_payload, add_import_job_lease, add_row_versions,
+]
+
+def upgrade(engine):
+    with engine.connect() as conn:
+        driver = conn.connection.driver_connection if conn.dialect.name == "sqlite" else None
+        # table rebuilds must not fire ON DELETE CASCADE; the pragma is a no-op inside a transaction
+        if driver is not None:
+            driver.execute("PRAGMA foreign_keys=OFF")
+        try:
+            with conn.begin():
+                for step in STEPS:
+                    step(conn)
+        finally:
+            if driver is not None:
+                driver.execute("PRAGMA foreign_keys=ON")
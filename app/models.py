@@ -1,7 +1,20 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, UniqueConstraint, event
+from sqlalchemy.dialects.mysql import LONGTEXT
 from sqlalchemy.orm import relationship
 from .database import Base
+from .search import attach_search_index
 from datetime import datetime, timezone
+import secrets
+
+# Deletes cascade in the database (ON DELETE CASCADE; SQLite needs PRAGMA foreign_keys,
+# see database.py). passive_deletes stops the ORM from loading children just to delete them.
+
+# Row versions behind the ETags of GET /students/{id} and GET /courses/{id}: crud
+# adds 1 in the same statement that changes the row (a seat reservation already
+# UPDATEs the course), so no other row is locked. A new row starts at a random
+# value, so an id SQLite hands out again after a delete doesn't repeat an old ETag.
+def _initial_version():
+    return secrets.randbelow(2 ** 31)
 
 # Person is *abstract* conceptually — we use Python inheritance but each subclass has its own table
 class PersonMixin:
@@ -11,26 +24,30 @@ class PersonMixin:
 
 class Student(Base, PersonMixin):
     __tablename__ = "students"
-    enrollments = relationship("Enrollment", back_populates="student", cascade="all, delete-orphan")
+    version = Column(Integer, nullable=False, default=_initial_version, server_default="0")
+    enrollments = relationship("Enrollment", back_populates="student", cascade="all, delete-orphan", passive_deletes=True)
 
 class Teacher(Base, PersonMixin):
     __tablename__ = "teachers"
-    courses = relationship("Course", back_populates="teacher", cascade="all, delete-orphan")
+    courses = relationship("Course", back_populates="teacher", cascade="all, delete-orphan", passive_deletes=True)
 
 class Course(Base):
     __tablename__ = "courses"
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     capacity = Column(Integer, default=30)
-    teacher_id = Column(Integer, ForeignKey("teachers.id"), nullable=True)
+    # seats taken; kept in step with enrollments by crud so capacity checks are one UPDATE
+    enrolled_count = Column(Integer, nullable=False, default=0, server_default="0")
+    version = Column(Integer, nullable=False, default=_initial_version, server_default="0")
+    teacher_id = Column(Integer, ForeignKey("teachers.id", ondelete="CASCADE"), nullable=True)
     teacher = relationship("Teacher", back_populates="courses")
-    enrollments = relationship("Enrollment", back_populates="course", cascade="all, delete-orphan")
+    enrollments = relationship("Enrollment", back_populates="course", cascade="all, delete-orphan", passive_deletes=True)
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
     id = Column(Integer, primary_key=True, index=True)
-    student_id = Column(Integer, ForeignKey("students.id"))
-    course_id = Column(Integer, ForeignKey("courses.id"))
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"))
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"))
     enrolled_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     student = relationship("Student", back_populates="enrollments")
@@ -45,5 +62,66 @@ class ScrapedResource(Base):
     title = Column(String(255))
     link = Column(String(1024), unique=True, index=True)
     image_url = Column(String(1024))
-    price = Column(String(50))
-    scraped_at = Column(String(32))
+    # price in minor units (pence, cents) with its ISO 4217 code; None when the page showed no price
+    price_minor = Column(Integer, index=True)
+    currency = Column(String(3))
+    # naive UTC
+    scraped_at = Column(DateTime, index=True)
+
+attach_search_index(ScrapedResource.__table__)
+
+# Background imports (see jobs.py). The validated items wait in `payload` as a JSON
+# array until the job finishes; the counters are committed with each chunk, so a
+# restarted job carries on after the last committed chunk.
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    # queued, running, done or failed
+    status = Column(String(16), nullable=False, index=True)
+    # MySQL's TEXT stops at 64 KB, a few hundred items
+    payload = Column(Text().with_variant(LONGTEXT, "mysql", "mariadb"))
+    total = Column(Integer, nullable=False)
+    processed = Column(Integer, nullable=False, default=0)
+    accepted = Column(Integer, nullable=False, default=0)
+    duplicate = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    # the JobRunner running it, and when that runner last renewed its lease
+    owner = Column(String(64))
+    heartbeat_at = Column(DateTime)
+    # naive UTC
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+# Change counters behind the ETags of the list endpoints: crud bumps a table's row
+# in the same transaction as the write, so writes from other processes (the
+# scraper's import) move the ETag too. Reading one is a primary-key lookup. Every
+# writer of the table waits on that row, so it is only used where writers are
+# serialized anyway (scraped_resources, see crud._lock_change_feed); single rows
+# carry their own version column instead.
+VERSIONED_TABLES = ("scraped_resources",)
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def _seed_table_versions(target, connection, **kw):
+    connection.execute(target.insert(), [{"name": name, "version": 0} for name in VERSIONED_TABLES])
+
+# Change feed for scraped_resources (GET /scraped_resources/changes): crud appends
+# one row per inserted or deleted resource in the same transaction as the write, so
+# the scraper's save_to_db in another process lands in the feed too. seq is the
+# feed position; AUTOINCREMENT keeps SQLite from handing a seq out twice.
+class ScrapedChange(Base):
+    __tablename__ = "scraped_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+    seq = Column(Integer, primary_key=True)
+    # insert or delete
+    op = Column(String(8), nullable=False)
+    # no foreign key: the row outlives the resource it describes
+    resource_id = Column(Integer, nullable=False)
+    link = Column(String(1024), nullable=False)
+    # naive UTC
+    changed_at = Column(DateTime, nullable=False)
@@ -1,6 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import csv
+import time
+from contextlib import suppress
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from . import crud, schemas, database
+from . import changes, crud, models, schemas, database, jobs, metrics
+from .cache import entity_cache
+from .config import settings
 from .database import SessionLocal
 
 def get_db():
@@ -10,8 +21,96 @@ def get_db():
     finally:
         db.close()
 
+class FastJSONResponse(Response):
+    """A body already serialized by a pydantic TypeAdapter.
+
+    Returning a Response makes FastAPI skip response_model validation and
+    jsonable_encoder; response_model still documents the shape.
+    """
+    media_type = "application/json"
+
+# Conditional GET: the ETag is a version counter, the table's (crud.table_version)
+# for lists and the row's own for single entities. The table counter is read
+# before anything else, so a list poll whose If-None-Match still matches costs one
+# primary-key lookup and gets a 304 without running the row query. A row's version
+# is cached with its body, so its ETag always names the body it is sent with and a
+# cache hit needs no query at all.
+def _etag(*parts) -> dict:
+    return {"ETag": '"' + "-".join(str(p) for p in parts) + '"'}
+
+def _etag_headers(db: Session, table: str, *parts) -> dict:
+    version = crud.table_version(db, table)
+    if version is None:
+        # no counter row to bump, so no ETag that could go stale
+        return {}
+    return _etag(table, version, *parts)
+
+def _not_modified(request: Request, headers: dict) -> Response | None:
+    etag = headers.get("ETag")
+    tags = request.headers.get("if-none-match", "")
+    if etag and etag in (t.strip().removeprefix("W/") for t in tags.split(",")):
+        return Response(status_code=304, headers=headers)
+    return None
+
 router = APIRouter()
 
+# Bulk people import
+def _bulk_result(rows: list[tuple[int, dict]], outcomes, invalid=()) -> dict:
+    results = [
+        {"index": i, "email": row["email"], "status": status, "id": pid}
+        for (i, row), (status, pid) in zip(rows, outcomes)
+    ]
+    results.extend(invalid)
+    results.sort(key=lambda r: r["index"])
+    return {"created": sum(1 for r in results if r["status"] == "created"), "results": results}
+
+def _invalid_row(index: int, record: dict, detail: str) -> dict:
+    return {"index": index, "email": record.get("email"), "status": "invalid", "id": None, "detail": detail}
+
+async def _bulk_create_csv(request: Request, db: Session, schema, create) -> dict:
+    """Read a CSV upload (header row with name and email) line by line, creating every INGEST_CHUNK_SIZE valid rows.
+
+    A quoted field can't span lines. Rows that fail validation are reported as
+    "invalid" and don't stop the upload.
+    """
+    if "csv" not in request.headers.get("content-type", ""):
+        raise HTTPException(status_code=415, detail="Expected text/csv")
+    header, index = None, 0
+    rows, outcomes, invalid, batch = [], [], [], []
+
+    async def flush():
+        outcomes.extend(await run_in_threadpool(create, db, [row for _, row in batch]))
+        rows.extend(batch)
+
+    async for line in _iter_lines(request):
+        try:
+            fields = next(csv.reader([line.decode("utf-8-sig").rstrip("\r")]), [])
+        except UnicodeDecodeError:
+            fields = None
+        if fields == []:
+            continue
+        if header is None:
+            header = [f.strip().lower() for f in fields or ()]
+            if not {"name", "email"} <= set(header):
+                raise HTTPException(status_code=400, detail="CSV header must have name and email columns")
+            continue
+        record = dict(zip(header, fields or ()))
+        try:
+            if fields is None:
+                raise ValueError("Row is not valid UTF-8")
+            batch.append((index, schema.model_validate(record).model_dump()))
+        except ValidationError as e:
+            invalid.append(_invalid_row(index, record, "; ".join(err["msg"] for err in e.errors())))
+        except ValueError as e:
+            invalid.append(_invalid_row(index, record, str(e)))
+        index += 1
+        if len(batch) >= settings.INGEST_CHUNK_SIZE:
+            await flush()
+            batch = []
+    if batch:
+        await flush()
+    return _bulk_result(rows, outcomes, invalid)
+
 # Students
 @router.post("/students", response_model=schemas.StudentOut)
 def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)):
@@ -21,12 +120,41 @@ def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/students/{id}", response_model=schemas.StudentOut)
-def get_student(id: int, db: Session = Depends(get_db)):
-    s = crud.get_student(db, id)
+def get_student(id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    s = crud.get_student_cached(db, id)
     if not s:
         raise HTTPException(status_code=404, detail="Student not found")
+    headers = _etag(models.Student.__tablename__, id, s["version"])
+    not_modified = _not_modified(request, headers)
+    if not_modified is not None:
+        return not_modified
+    response.headers.update(headers)
     return s
 
+@router.post("/students:bulk", response_model=schemas.BulkCreateResult)
+def bulk_create_students(people: list[schemas.StudentCreate], db: Session = Depends(get_db)):
+    rows = [p.model_dump() for p in people]
+    return _bulk_result(list(enumerate(rows)), crud.bulk_create_students(db, rows))
+
+@router.post("/students:bulk/stream", response_model=schemas.BulkCreateResult)
+async def bulk_create_students_csv(request: Request, db: Session = Depends(get_db)):
+    return await _bulk_create_csv(request, db, schemas.StudentCreate, crud.bulk_create_students)
+
+@router.get("/students/{id}/courses", response_model=schemas.StudentSchedule)
+def student_courses(
+    id: int,
+    limit: int = Query(50, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    try:
+        page = crud.student_schedule(db, id, limit, cursor)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return FastJSONResponse(schemas.STUDENT_SCHEDULE.dump_json(page))
+
 @router.delete("/students/{id}")
 def delete_student(id: int, db: Session = Depends(get_db)):
     ok = crud.delete_student(db, id)
@@ -39,6 +167,15 @@ def delete_student(id: int, db: Session = Depends(get_db)):
 def create_teacher(teacher: schemas.TeacherCreate, db: Session = Depends(get_db)):
     return crud.create_teacher(db, teacher)
 
+@router.post("/teachers:bulk", response_model=schemas.BulkCreateResult)
+def bulk_create_teachers(people: list[schemas.TeacherCreate], db: Session = Depends(get_db)):
+    rows = [p.model_dump() for p in people]
+    return _bulk_result(list(enumerate(rows)), crud.bulk_create_teachers(db, rows))
+
+@router.post("/teachers:bulk/stream", response_model=schemas.BulkCreateResult)
+async def bulk_create_teachers_csv(request: Request, db: Session = Depends(get_db)):
+    return await _bulk_create_csv(request, db, schemas.TeacherCreate, crud.bulk_create_teachers)
+
 @router.delete("/teachers/{id}")
 def delete_teacher(id: int, db: Session = Depends(get_db)):
     ok = crud.delete_teacher(db, id)
@@ -49,13 +186,21 @@ def delete_teacher(id: int, db: Session = Depends(get_db)):
 # Courses
 @router.post("/courses", response_model=schemas.CourseOut)
 def create_course(course: schemas.CourseCreate, db: Session = Depends(get_db)):
-    return crud.create_course(db, course)
+    try:
+        return crud.create_course(db, course)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
 
 @router.get("/courses/{id}", response_model=schemas.CourseOut)
-def get_course(id:int, db: Session = Depends(get_db)):
-    c = crud.get_course(db, id)
+def get_course(id:int, request: Request, response: Response, db: Session = Depends(get_db)):
+    c = crud.get_course_cached(db, id)
     if not c:
         raise HTTPException(status_code=404, detail="Course not found")
+    headers = _etag(models.Course.__tablename__, id, c["version"])
+    not_modified = _not_modified(request, headers)
+    if not_modified is not None:
+        return not_modified
+    response.headers.update(headers)
     return c
 
 @router.delete("/courses/{id}")
@@ -65,6 +210,29 @@ def delete_course(id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Course not found")
     return {"deleted": True}
 
+@router.get("/courses/{id}/roster", response_model=schemas.CourseRoster)
+def course_roster(
+    id: int,
+    limit: int = Query(50, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    try:
+        page = crud.course_roster(db, id, limit, cursor)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return FastJSONResponse(schemas.COURSE_ROSTER.dump_json(page))
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/cache/stats")
+def cache_stats():
+    return entity_cache.stats()
+
 # Enroll
 @router.post("/students/{id}/enroll")
 def enroll(id:int, payload: dict, db: Session = Depends(get_db)):
@@ -73,20 +241,211 @@ def enroll(id:int, payload: dict, db: Session = Depends(get_db)):
     if course_id is None:
         raise HTTPException(status_code=400, detail="course_id required")
     try:
-        e = crud.enroll_student(db, id, course_id)
-        return {"enrollment_id": e.id}
+        enrollment_id = crud.enroll_student(db, id, course_id)
+        return {"enrollment_id": enrollment_id}
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
 
+@router.post("/courses/{id}/enrollments:bulk", response_model=schemas.BulkEnrollResult)
+def bulk_enroll(id: int, payload: schemas.BulkEnrollRequest, db: Session = Depends(get_db)):
+    try:
+        results = crud.bulk_enroll(db, id, payload.student_ids)
+    except ValueError as ve:
+        status = 404 if str(ve) == "Course not found" else 409
+        raise HTTPException(status_code=status, detail=str(ve))
+    return {
+        "course_id": id,
+        "enrolled": sum(1 for _, status in results if status == "enrolled"),
+        "results": [{"student_id": sid, "status": status} for sid, status in results],
+    }
+
+@router.delete("/students/{id}/enroll/{course_id}")
+def unenroll(id: int, course_id: int, db: Session = Depends(get_db)):
+    ok = crud.unenroll_student(db, id, course_id)
+    if not ok:
+        raise HTTPException(status_code=404, detail="Enrollment not found")
+    return {"deleted": True}
+
 # Scraped import
-@router.post("/import/scraped")
-def import_scraped(items: list[schemas.ScrapedResourceIn], db: Session = Depends(get_db)):
+@router.post("/import/scraped", responses={202: {"model": schemas.ImportJobAccepted}})
+def import_scraped(
+    items: list[schemas.ScrapedResourceIn],
+    run_async: bool = Query(False, alias="async", description="queue the import and return 202 with a job id"),
+    db: Session = Depends(get_db),
+):
+    if run_async:
+        job = crud.create_import_job(db, schemas.SCRAPED_ITEMS.dump_json(items).decode(), len(items))
+        jobs.runner.submit(job.id)
+        return JSONResponse(
+            {"job_id": job.id, "status": job.status}, status_code=202, headers={"Location": f"/jobs/{job.id}"})
     added = crud.import_scraped(db, [it.model_dump() for it in items])
     return {"imported": len(added)}
 
-@router.get("/scraped_resources")
-def list_scraped(db: Session = Depends(get_db)):
-    return crud.list_scraped(db)
+@router.get("/jobs/{id}", response_model=schemas.ImportJobOut)
+def get_job(id: int, db: Session = Depends(get_db)):
+    job = crud.get_import_job(db, id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+async def _iter_lines(request: Request):
+    # split the body into lines as chunks arrive, without buffering the whole upload
+    buf = b""
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line
+    if buf:
+        yield buf
+
+@router.post("/import/scraped/stream", response_model=schemas.StreamImportResult)
+async def import_scraped_stream(request: Request, db: Session = Depends(get_db)):
+    if "ndjson" not in request.headers.get("content-type", ""):
+        raise HTTPException(status_code=415, detail="Expected application/x-ndjson")
+    result = {"accepted": 0, "duplicate": 0, "invalid": 0, "batches": []}
+    batch, invalid = [], 0
+
+    async def flush():
+        ids = await run_in_threadpool(crud.bulk_insert_scraped, db, batch) if batch else []
+        counts = {"batch": len(result["batches"]) + 1, "accepted": len(ids), "duplicate": len(batch) - len(ids), "invalid": invalid}
+        result["batches"].append(counts)
+        for key in ("accepted", "duplicate", "invalid"):
+            result[key] += counts[key]
+
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        try:
+            batch.append(schemas.ScrapedResourceIn.model_validate_json(line).model_dump())
+        except ValidationError:
+            invalid += 1
+        if len(batch) + invalid >= settings.INGEST_CHUNK_SIZE:
+            await flush()
+            batch, invalid = [], 0
+    if batch or invalid:
+        await flush()
+    return result
+
+@router.get("/scraped_resources", response_model=schemas.ScrapedResourcePage)
+def list_scraped(
+    request: Request,
+    limit: int = Query(50, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    scraped_from: Optional[datetime] = None,
+    scraped_to: Optional[datetime] = None,
+    min_price: Optional[int] = Query(None, description="in minor units, e.g. pence"),
+    max_price: Optional[int] = Query(None, description="in minor units, e.g. pence"),
+    sort: str = Query("id", description="id, price, -price, scraped_at or -scraped_at"),
+    db: Session = Depends(get_db),
+):
+    headers = _etag_headers(db, "scraped_resources")
+    not_modified = _not_modified(request, headers)
+    if not_modified is not None:
+        return not_modified
+    try:
+        items, next_cursor = crud.list_scraped(
+            db, limit, cursor, schemas.parse_scraped_at(scraped_from), schemas.parse_scraped_at(scraped_to),
+            min_price, max_price, sort,
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return FastJSONResponse(schemas.SCRAPED_PAGE.dump_json({"items": items, "next_cursor": next_cursor}), headers=headers)
+
+@router.get("/scraped_resources/search", response_model=schemas.ScrapedResourcePage)
+def search_scraped(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    try:
+        items, next_cursor = crud.search_scraped(db, q, limit, cursor)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return FastJSONResponse(schemas.SCRAPED_PAGE.dump_json({"items": items, "next_cursor": next_cursor}))
+
+# Change feed: inserts and deletes of scraped resources in commit order. GET pages
+# through it with a cursor; the stream pushes the same entries as server-sent events.
+@router.get("/scraped_resources/changes", response_model=schemas.ScrapedChangePage)
+def list_scraped_changes(
+    request: Request,
+    since: Optional[str] = Query(None, description="next_cursor of the previous page; omit to start at the beginning"),
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    headers = _etag_headers(db, "scraped_resources", "changes", since or "", limit)
+    not_modified = _not_modified(request, headers)
+    if not_modified is not None:
+        return not_modified
+    try:
+        after = crud.change_seq(since) if since else 0
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    items = crud.scraped_changes(db, after, limit)
+    next_cursor = crud.change_cursor(items[-1]["seq"] if items else after)
+    return FastJSONResponse(schemas.SCRAPED_CHANGE_PAGE.dump_json({"items": items, "next_cursor": next_cursor}), headers=headers)
+
+def _read_changes(db: Session, after: int) -> list[dict]:
+    try:
+        return crud.scraped_changes(db, after, settings.MAX_PAGE_SIZE)
+    finally:
+        # end the transaction: the next read sees new commits and an idle stream holds no connection
+        db.close()
+
+async def _scraped_change_events(request: Request, db: Session, after: int):
+    """Yield an SSE frame per change after seq `after`, and a comment when idle for CHANGE_FEED_KEEPALIVE_SECONDS."""
+    quiet_since = time.monotonic()
+    while not await request.is_disconnected():
+        with changes.notifier.listen() as woken:
+            items = await run_in_threadpool(_read_changes, db, after)
+            if not items:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(woken.wait(), settings.CHANGE_FEED_POLL_SECONDS)
+        for item in items:
+            after = item["seq"]
+            data = schemas.SCRAPED_CHANGE.dump_json(item).decode()
+            yield f"id: {crud.change_cursor(after)}\nevent: {item['op']}\ndata: {data}\n\n"
+        now = time.monotonic()
+        if items:
+            quiet_since = now
+        elif now - quiet_since >= settings.CHANGE_FEED_KEEPALIVE_SECONDS:
+            quiet_since = now
+            yield ": keep-alive\n\n"
+
+@router.get("/scraped_resources/changes/stream", response_class=StreamingResponse)
+def stream_scraped_changes(
+    request: Request,
+    since: Optional[str] = Query(None, description="cursor to replay from; omit to get only changes from now on"),
+    db: Session = Depends(get_db),
+):
+    """Server-sent events, one per change (event: insert or delete, id: its cursor).
+
+    A reconnecting EventSource sends the last id as Last-Event-ID and carries
+    on from there.
+    """
+    cursor = request.headers.get("last-event-id") or since
+    try:
+        after = crud.change_seq(cursor) if cursor else crud.latest_change_seq(db)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    finally:
+        db.close()
+    return StreamingResponse(
+        _scraped_change_events(request, db, after), media_type="text/event-stream", headers={"Cache-Control": "no-cache"},
+    )
+
+@router.delete("/scraped_resources")
+def delete_scraped_bulk(
+    ids: Optional[list[int]] = Query(None, description="repeat for each id: ?ids=1&ids=2"),
+    before: Optional[datetime] = Query(None, description="purge everything scraped before this time"),
+    db: Session = Depends(get_db),
+):
+    if (ids is None) == (before is None):
+        raise HTTPException(status_code=400, detail="Pass either ids or before")
+    if ids is not None:
+        return {"deleted": crud.delete_scraped_ids(db, ids)}
+    return {"deleted": crud.purge_scraped_before(db, schemas.parse_scraped_at(before))}
 
 @router.delete("/scraped_resources/{id}")
 def delete_scraped(id: int, db: Session = Depends(get_db)):
@@ -1,5 +1,10 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+import re
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, Optional
+from pydantic import BaseModel, ConfigDict, TypeAdapter, field_validator, model_validator
+# pydantic needs typing_extensions.TypedDict before Python 3.12
+from typing_extensions import TypedDict
 
 class StudentCreate(BaseModel):
     name: str
@@ -17,6 +22,19 @@ class TeacherOut(TeacherCreate):
     id: int
     model_config = ConfigDict(from_attributes=True)
 
+class BulkCreateOutcome(BaseModel):
+    # position of the record in the request (CSV: data rows, header not counted)
+    index: int
+    email: Optional[str] = None
+    # created | exists (email already stored) | duplicate (repeated in the request) | invalid
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkCreateResult(BaseModel):
+    created: int
+    results: list[BulkCreateOutcome]
+
 class CourseCreate(BaseModel):
     title: str
     capacity: int = 30
@@ -24,15 +42,198 @@ class CourseCreate(BaseModel):
 
 class CourseOut(CourseCreate):
     id: int
+    enrolled_count: int = 0
     model_config = ConfigDict(from_attributes=True)
 
 class EnrollmentCreate(BaseModel):
     student_id: int
     course_id: int
 
+class BulkEnrollRequest(BaseModel):
+    student_ids: list[int]
+
+class BulkEnrollOutcome(BaseModel):
+    student_id: int
+    # enrolled | duplicate | no-capacity | unknown-student
+    status: str
+
+class BulkEnrollResult(BaseModel):
+    course_id: int
+    enrolled: int
+    results: list[BulkEnrollOutcome]
+
+# List responses are TypedDicts, not models: read paths select plain column rows,
+# and the TypeAdapters below turn those dicts straight into JSON bytes without
+# building a model per row (see FastJSONResponse in routes.py).
+
+class RosterEntry(TypedDict):
+    student_id: int
+    name: str
+    email: str
+    enrolled_at: Optional[datetime]
+
+class CourseRoster(TypedDict):
+    course_id: int
+    title: str
+    capacity: int
+    # seats_used comes from Course.enrolled_count, not a COUNT over the roster
+    seats_used: int
+    seats_available: int
+    items: list[RosterEntry]
+    next_cursor: Optional[str]
+
+class ScheduleEntry(TypedDict):
+    course_id: int
+    title: str
+    teacher_id: Optional[int]
+    capacity: int
+    seats_used: int
+    enrolled_at: Optional[datetime]
+
+class StudentSchedule(TypedDict):
+    student_id: int
+    items: list[ScheduleEntry]
+    next_cursor: Optional[str]
+
+# Scraped prices arrive as text ("£51.77", "Â£51.77" from a mis-decoded page,
+# "No price"); they are stored as integer minor units plus an ISO 4217 code.
+CURRENCY_SYMBOLS = {"£": "GBP", "$": "USD", "€": "EUR", "¥": "JPY"}
+# ISO 4217 digits after the decimal point where they aren't 2
+CURRENCY_EXPONENTS = {"JPY": 0, "KRW": 0, "BHD": 3, "KWD": 3}
+# The old text prices all came from the scraper's catalogue, which prices in
+# pounds; a bare "51.77" gets this currency instead of NULL, both when the
+# migration converts stored rows and when old JSON output is imported again.
+LEGACY_CURRENCY = "GBP"
+_AMOUNT = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_CODE = re.compile(r"\b[A-Z]{3}\b")
+
+def parse_price(text: Any, default_currency: Optional[str] = None) -> tuple[Optional[int], Optional[str]]:
+    """Return (minor units, currency code) for a price string or number; (None, None) if there is no amount.
+
+    Minor units follow the currency's ISO 4217 exponent: £51.77 -> 5177, ¥500 -> 500.
+    """
+    if text is None or isinstance(text, bool):
+        return None, None
+    if isinstance(text, (int, float, Decimal)):
+        amount, currency = Decimal(str(text)), default_currency
+    else:
+        match = _AMOUNT.search(text)
+        if not match:
+            return None, None
+        try:
+            amount = Decimal(match.group().replace(",", ""))
+        except InvalidOperation:
+            return None, None
+        symbol = next((code for sym, code in CURRENCY_SYMBOLS.items() if sym in text), None)
+        code = _CODE.search(text)
+        currency = symbol or (code.group() if code else default_currency)
+    return int(amount.scaleb(CURRENCY_EXPONENTS.get(currency, 2)).to_integral_value()), currency
+
+_DATETIME = TypeAdapter(datetime)
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # what DateTime columns store
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def parse_scraped_at(value: Any) -> Optional[datetime]:
+    """Parse a scrape timestamp (a datetime or ISO 8601 text, "Z" suffix included) into naive UTC."""
+    if value is None or value == "":
+        return None
+    return naive_utc(_DATETIME.validate_python(value.strip() if isinstance(value, str) else value))
+
 class ScrapedResourceIn(BaseModel):
     title: str
     link: str
     image_url: str = ""
-    price: str = ""
-    scraped_at: str = ""
+    price_minor: Optional[int] = None
+    currency: Optional[str] = None
+    scraped_at: Optional[datetime] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _split_price(cls, data):
+        # older clients and scraper output send "price": "51.77"
+        if isinstance(data, dict) and "price" in data and data.get("price_minor") is None:
+            data = dict(data)
+            data["price_minor"], currency = parse_price(data.pop("price"), data.get("currency") or LEGACY_CURRENCY)
+            data["currency"] = currency
+        return data
+
+    @field_validator("scraped_at", mode="before")
+    @classmethod
+    def _blank_scraped_at(cls, value):
+        # the scraper's older JSON output writes "" for a missing time
+        return None if value == "" else value
+
+    @field_validator("scraped_at")
+    @classmethod
+    def _scraped_at(cls, value):
+        return naive_utc(value)
+
+class ScrapedResourceOut(TypedDict):
+    id: int
+    title: Optional[str]
+    link: str
+    image_url: Optional[str]
+    price_minor: Optional[int]
+    currency: Optional[str]
+    scraped_at: Optional[datetime]
+
+class ScrapedResourcePage(TypedDict):
+    items: list[ScrapedResourceOut]
+    next_cursor: Optional[str]
+
+class ScrapedChange(TypedDict):
+    seq: int
+    # insert or delete
+    op: str
+    id: int
+    link: str
+    changed_at: datetime
+    # inserts only: the resource as stored now, None once it is deleted
+    resource: Optional[ScrapedResourceOut]
+
+class ScrapedChangePage(TypedDict):
+    items: list[ScrapedChange]
+    # always set: pass it as `since` to get the changes after these
+    next_cursor: str
+
+COURSE_ROSTER = TypeAdapter(CourseRoster)
+STUDENT_SCHEDULE = TypeAdapter(StudentSchedule)
+SCRAPED_PAGE = TypeAdapter(ScrapedResourcePage)
+SCRAPED_CHANGE = TypeAdapter(ScrapedChange)
+SCRAPED_CHANGE_PAGE = TypeAdapter(ScrapedChangePage)
+
+class ImportBatchResult(BaseModel):
+    batch: int
+    accepted: int
+    duplicate: int
+    invalid: int
+
+class StreamImportResult(BaseModel):
+    accepted: int
+    duplicate: int
+    invalid: int
+    batches: list[ImportBatchResult]
+
+# payload of a background import: stored as JSON, validated again by the worker
+SCRAPED_ITEMS = TypeAdapter(list[ScrapedResourceIn])
+
+class ImportJobAccepted(BaseModel):
+    job_id: int
+    status: str
+
+class ImportJobOut(BaseModel):
+    id: int
+    status: str
+    total: int
+    processed: int
+    accepted: int
+    duplicate: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
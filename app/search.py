@@ -0,0 +1,96 @@
+import re
+import sys
+from sqlalchemy import DDL, event, inspect, text
+
+# Full-text index over scraped_resources.title.
+#
+# SQLite: an external-content FTS5 table (it stores only the index, the rows stay
+# in scraped_resources) kept in step by triggers, so every write path -- ORM,
+# Core bulk inserts, bulk deletes -- updates it without crud having to know.
+# MySQL/MariaDB: a FULLTEXT index queried with MATCH ... AGAINST.
+# Other dialects fall back to SQLAlchemy's generic column.match().
+
+FTS_TABLE = "scraped_resources_fts"
+FULLTEXT_INDEX = "ix_scraped_resources_title_ft"
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, content='scraped_resources', content_rowid='id')",
+    f"""CREATE TRIGGER IF NOT EXISTS scraped_resources_fts_ai AFTER INSERT ON scraped_resources BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title) VALUES (new.id, new.title);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS scraped_resources_fts_ad AFTER DELETE ON scraped_resources BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title) VALUES ('delete', old.id, old.title);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS scraped_resources_fts_au AFTER UPDATE OF title ON scraped_resources BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO {FTS_TABLE}(rowid, title) VALUES (new.id, new.title);
+    END""",
+]
+MYSQL_DDL = [f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} ON scraped_resources (title)"]
+MYSQL_DIALECTS = ("mysql", "mariadb")
+
+def attach_search_index(table):
+    """Create (and drop) the dialect's full-text index together with `table`."""
+    for stmt in SQLITE_DDL:
+        event.listen(table, "after_create", DDL(stmt).execute_if(dialect="sqlite"))
+    # the triggers go with the table; the FTS table has to be dropped explicitly
+    event.listen(table, "after_drop", DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite"))
+    for stmt in MYSQL_DDL:
+        event.listen(table, "after_create", DDL(stmt).execute_if(dialect=MYSQL_DIALECTS))
+
+def strategy(dialect_name: str) -> str:
+    if dialect_name == "sqlite":
+        return "fts5"
+    if dialect_name in MYSQL_DIALECTS:
+        return "fulltext"
+    return "match"
+
+def fts5_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, operators in `q` are taken literally."""
+    words = re.findall(r"\w+", q)
+    if not words:
+        raise ValueError("Search query has no words")
+    return " ".join(f'"{w}"' for w in words)
+
+def ensure_index(conn) -> bool:
+    """Create the full-text index on a database that predates it; returns True if it was created (and filled)."""
+    insp = inspect(conn)
+    if not insp.has_table("scraped_resources"):
+        return False
+    kind = strategy(conn.dialect.name)
+    if kind == "fts5":
+        if insp.has_table(FTS_TABLE):
+            return False
+        for stmt in SQLITE_DDL:
+            conn.execute(text(stmt))
+        rebuild(conn)
+        return True
+    if kind == "fulltext":
+        if any(ix["name"] == FULLTEXT_INDEX for ix in insp.get_indexes("scraped_resources")):
+            return False
+        for stmt in MYSQL_DDL:
+            conn.execute(text(stmt))
+        return True
+    return False
+
+def rebuild(conn):
+    """Re-index every existing row (FTS5 only; FULLTEXT indexes are maintained by the server)."""
+    if strategy(conn.dialect.name) == "fts5":
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+def main(argv=None):
+    """python -m app.search rebuild -- create the index if missing and re-index all scraped resources."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv != ["rebuild"]:
+        print("usage: python -m app.search rebuild")
+        return 2
+    from .database import engine
+    with engine.begin() as conn:
+        if not ensure_index(conn):
+            rebuild(conn)
+        rows = conn.execute(text("SELECT COUNT(*) FROM scraped_resources")).scalar()
+    print(f"search index rebuilt ({strategy(engine.dialect.name)}, {rows} rows)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
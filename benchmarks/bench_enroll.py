@@ -0,0 +1,104 @@
+"""Fire parallel enroll requests at one course and check it is never overbooked.
+
+    python benchmarks/bench_enroll.py --requests 2000 --workers 32 --capacity 150
+
+Each request runs crud.enroll_student in its own session against a fresh
+SQLite file, the way concurrent API workers would. Reports outcome counts
+and p50/p99 latency.
+"""
+import argparse
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import Base
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def run(requests=2000, workers=32, capacity=150, url=None):
+    tmp = None
+    if url is None:
+        tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{tmp.name}/enroll.db"
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30} if url.startswith("sqlite") else {})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    with Session() as db:
+        course_id = db.execute(insert(models.Course).values(title="Rush", capacity=capacity)).inserted_primary_key[0]
+        db.execute(insert(models.Student), [{"name": f"S{i}", "email": f"s{i}@bench.test"} for i in range(requests)])
+        db.commit()
+        student_ids = list(db.scalars(select(models.Student.id)))
+
+    def enroll(student_id):
+        start = time.perf_counter()
+        with Session() as db:
+            try:
+                crud.enroll_student(db, student_id, course_id)
+                outcome = "enrolled"
+            except ValueError as e:
+                outcome = str(e)
+            except OperationalError:
+                outcome = "db error"
+        return outcome, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(enroll, student_ids))
+    elapsed = time.perf_counter() - start
+
+    with Session() as db:
+        rows = db.scalar(select(func.count()).select_from(models.Enrollment))
+        counter = db.scalar(select(models.Course.enrolled_count).where(models.Course.id == course_id))
+    engine.dispose()
+    if tmp is not None:
+        tmp.cleanup()
+
+    latencies = [r[1] for r in results]
+    outcomes = Counter(r[0] for r in results)
+    assert rows <= capacity, f"overbooked: {rows} enrollments for {capacity} seats"
+    assert counter == rows, f"enrolled_count {counter} != {rows} enrollment rows"
+    return {
+        "requests": requests,
+        "workers": workers,
+        "capacity": capacity,
+        "enrolled": rows,
+        "outcomes": dict(outcomes),
+        "req_per_sec": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--capacity", type=int, default=150)
+    ap.add_argument("--url", help="database URL (default: a temporary SQLite file)")
+    args = ap.parse_args()
+    r = run(args.requests, args.workers, args.capacity, args.url)
+    print(f"{r['requests']} requests, {r['workers']} workers, {r['capacity']} seats")
+    print(f"enrolled={r['enrolled']} outcomes={r['outcomes']}")
+    print(f"{r['req_per_sec']:.0f} req/s  p50={r['p50_ms']:.1f}ms  p99={r['p99_ms']:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Parse the saved catalogue fixtures with every parser backend.
+
+    python benchmarks/bench_parse.py --rounds 50
+
+Reports pages per second and memory, and checks that every backend returns
+the same book dicts. Memory is the peak RSS of a fresh child process per
+backend, so libxml2's C allocations count too (tracemalloc only sees the
+Python heap): "rss" is the whole process after importing the backend and
+parsing every fixture page once, "+parse" how much of it the parsing added.
+Windows has neither /proc nor `resource`, so it reports no memory.
+"""
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+import time
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from scraper.parse import PARSERS
+
+FIXTURES = ROOT_DIR / "tests" / "fixtures"
+WEBSITE = "https://books.toscrape.com/"
+
+
+def load_pages():
+    return [p.read_text(encoding="utf-8") for p in sorted(FIXTURES.glob("catalogue-page-*.html"))]
+
+
+def books_for(parser, pages):
+    # imported here so the memory children don't load the app (SQLAlchemy, pydantic) too
+    from scraper import scrape
+    scrape.seen_urls.clear()
+    books = []
+    for html in pages:
+        books.extend(scrape.parse_book_data(html, WEBSITE, parser))
+    for b in books:
+        b.pop("scraped_at")
+    return books
+
+
+def bench(parser, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            parser.extract(html)
+    elapsed = time.perf_counter() - start
+    return {"pages_per_sec": rounds * len(pages) / elapsed}
+
+
+def peak_rss_kib():
+    # Linux's ru_maxrss keeps the high-water mark of the parent the child was
+    # forked from; VmHWM covers only this process image
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 if sys.platform == "darwin" else peak
+
+
+def child_memory(name):
+    """Run in the child process: parse every page once with backend `name` and report peak RSS."""
+    pages = load_pages()
+    parser = PARSERS[name]()
+    before = peak_rss_kib()
+    trees = [parser.extract(html) for html in pages]
+    after = peak_rss_kib()
+    return {"rss_kib": after, "parse_kib": after - before, "books": sum(len(t) for t in trees)}
+
+
+def memory(name):
+    try:
+        import resource  # noqa: F401
+    except ImportError:
+        return {"rss_kib": None, "parse_kib": None}
+    out = subprocess.run([sys.executable, __file__, "--memory-of", name], check=True, capture_output=True, text=True)
+    result = json.loads(out.stdout)
+    return {"rss_kib": result["rss_kib"], "parse_kib": result["parse_kib"]}
+
+
+def run(rounds=20):
+    pages = load_pages()
+    reference = None
+    results = {}
+    for name, cls in PARSERS.items():
+        parser = cls()
+        books = books_for(parser, pages)
+        if reference is None:
+            reference = books
+        elif books != reference:
+            raise AssertionError(f"{name} backend produced different book dicts")
+        results[name] = bench(parser, pages, rounds)
+    return results
+
+
+def run_memory():
+    return {name: memory(name) for name in PARSERS}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rounds", type=int, default=20, help="passes over the fixture pages per backend")
+    ap.add_argument("--memory-of", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.memory_of:
+        print(json.dumps(child_memory(args.memory_of)))
+        return
+    speed, mem = run(args.rounds), run_memory()
+
+    def kib(value):
+        return f"{value:>12.0f}" if value is not None else f"{'n/a':>12}"
+
+    print(f"{'backend':<10} {'pages/s':>10} {'rss KiB':>12} {'+parse KiB':>12}")
+    for name, r in speed.items():
+        print(f"{name:<10} {r['pages_per_sec']:>10.1f} {kib(mem[name]['rss_kib'])} {kib(mem[name]['parse_kib'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Title search: the FTS5 index behind crud.search_scraped against LIKE '%q%'.
+
+    python benchmarks/bench_search.py --rows 1000000 --rounds 5
+
+Fills a throwaway SQLite file with synthetic book titles (the FTS triggers
+index them as they go in), then times each query term through
+crud.search_scraped and through a LIKE scan of the same page size. Reports
+ms per query for both and checks that every FTS hit really contains the term.
+
+LIKE stops at the first page of matches, so for a word in every few titles it
+returns quickly (and unranked); rare or absent words make it scan the whole
+table. The FTS side always scores every match to rank them, so its cost
+grows with the number of matching rows, not the table size.
+"""
+import argparse
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from sqlalchemy import insert, select
+
+from app import crud, models
+from app.database import Base, make_session_factory
+
+WORDS = (
+    "light attic dark matter ocean night garden house river secret silent city king queen shadow "
+    "winter summer stone glass fire water iron golden lost last first wild little great broken"
+).split()
+# common word, rare word, two words, word not in any title
+TERMS = ["light", "zephyr", "golden river", "nonexistent"]
+
+
+def titles(rows, seed=7):
+    rng = random.Random(seed)
+    for i in range(rows):
+        words = rng.sample(WORDS, rng.randint(2, 5))
+        if i % 10000 == 0:
+            words.append("zephyr")
+        yield " ".join(words).title()
+
+
+def fill(Session, rows, chunk=50000):
+    with Session() as db:
+        batch = []
+        for i, title in enumerate(titles(rows)):
+            batch.append({"title": title, "link": f"http://bench.test/{i}", "price_minor": 1000, "currency": "GBP"})
+            if len(batch) == chunk:
+                db.execute(insert(models.ScrapedResource), batch)
+                batch = []
+        if batch:
+            db.execute(insert(models.ScrapedResource), batch)
+        db.commit()
+
+
+def ms_per_query(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def run(rows=100000, rounds=5, limit=50):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        writer, reader, Session = make_session_factory(f"sqlite:///{tmp}/search.db")
+        Base.metadata.create_all(writer)
+        start = time.perf_counter()
+        fill(Session, rows)
+        results["insert_rows_per_sec"] = rows / (time.perf_counter() - start)
+        SR = models.ScrapedResource
+        with Session() as db:
+            for term in TERMS:
+                hits, _ = crud.search_scraped(db, term, limit)
+                for word in term.split():
+                    assert all(word in h["title"].lower() for h in hits), term
+                like = select(SR).where(SR.title.ilike(f"%{term}%")).order_by(SR.id).limit(limit + 1)
+                results[term] = {
+                    "fts_ms": ms_per_query(lambda: crud.search_scraped(db, term, limit), rounds),
+                    "like_ms": ms_per_query(lambda: db.scalars(like).all(), rounds),
+                    "hits": len(hits),
+                }
+        writer.dispose()
+        reader.dispose()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1000000)
+    ap.add_argument("--rounds", type=int, default=5, help="timed runs of each query")
+    ap.add_argument("--limit", type=int, default=50, help="page size")
+    args = ap.parse_args()
+    results = run(args.rows, args.rounds, args.limit)
+    print(f"{args.rows} rows inserted at {results.pop('insert_rows_per_sec'):.0f} rows/s (FTS triggers included)")
+    print(f"{'query':<15} {'FTS ms':>10} {'LIKE ms':>10} {'speedup':>8} {'hits':>5}")
+    for term, r in results.items():
+        print(f"{term:<15} {r['fts_ms']:>10.2f} {r['like_ms']:>10.2f} {r['like_ms'] / r['fts_ms']:>7.1f}x {r['hits']:>5}")
+
+
+if __name__ == "__main__":
+    main()
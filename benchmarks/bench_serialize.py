@@ -0,0 +1,108 @@
+"""List-endpoint serialization: ORM objects + response_model against column rows + TypeAdapter.
+
+    python benchmarks/bench_serialize.py --sizes 100,1000,10000 --rounds 20
+
+"orm" is what GET /scraped_resources used to do per page: load ScrapedResource
+objects, validate them into the response model (from_attributes), turn that
+into JSON-able Python and json.dumps it, as FastAPI does for a response_model.
+"rows" is the current path: crud.list_scraped selects plain column rows and
+schemas.SCRAPED_PAGE dumps them straight to JSON bytes. Both bodies are
+checked to decode to the same data. Reports ms per page and the speedup.
+"""
+import argparse
+import json
+import pathlib
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import insert, select
+
+from app import crud, models, schemas
+from app.database import Base, make_session_factory
+
+
+class OrmItem(BaseModel):
+    # the response model list_scraped used before it switched to column rows
+    id: int
+    title: Optional[str] = None
+    link: str
+    image_url: Optional[str] = None
+    price_minor: Optional[int] = None
+    currency: Optional[str] = None
+    scraped_at: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
+
+
+class OrmPage(BaseModel):
+    items: list[OrmItem]
+    next_cursor: Optional[str] = None
+
+
+def orm_page(db, limit):
+    SR = models.ScrapedResource
+    rows = db.scalars(select(SR).order_by(SR.id).limit(limit + 1)).all()
+    page = OrmPage.model_validate({"items": rows[:limit], "next_cursor": None}, from_attributes=True)
+    body = json.dumps(page.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":")).encode()
+    db.expunge_all()
+    return body
+
+
+def rows_page(db, limit):
+    items, _ = crud.list_scraped(db, limit)
+    return schemas.SCRAPED_PAGE.dump_json({"items": items, "next_cursor": None})
+
+
+def ms_per_page(fn, rounds):
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def run(sizes=(100, 1000, 10000), rounds=20):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        writer, reader, Session = make_session_factory(f"sqlite:///{tmp}/serialize.db")
+        Base.metadata.create_all(writer)
+        with Session() as db:
+            db.execute(insert(models.ScrapedResource), [
+                {"title": f"Book {i}", "link": f"http://bench.test/{i}", "image_url": f"http://bench.test/{i}.jpg",
+                 "price_minor": 1000 + i, "currency": "GBP", "scraped_at": datetime(2024, 1, 1) + timedelta(seconds=i)}
+                for i in range(max(sizes) + 1)
+            ])
+            db.commit()
+            for size in sizes:
+                before, after = orm_page(db, size), rows_page(db, size)
+                if json.loads(before)["items"] != json.loads(after)["items"]:
+                    raise AssertionError(f"bodies differ at {size} rows")
+                results[size] = {
+                    "orm_ms": ms_per_page(lambda: orm_page(db, size), rounds),
+                    "rows_ms": ms_per_page(lambda: rows_page(db, size), rounds),
+                }
+        writer.dispose()
+        reader.dispose()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="100,1000,10000", help="rows per page")
+    ap.add_argument("--rounds", type=int, default=20, help="timed pages per size and path")
+    args = ap.parse_args()
+    results = run([int(s) for s in args.sizes.split(",") if s], args.rounds)
+    print(f"{'rows/page':>10} {'orm ms':>10} {'rows ms':>10} {'speedup':>8}")
+    for size, r in results.items():
+        print(f"{size:>10} {r['orm_ms']:>10.2f} {r['rows_ms']:>10.2f} {r['orm_ms'] / r['rows_ms']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Concurrent readers and writers against SQLite with each SQLITE_PROFILE.
+
+    python benchmarks/bench_sqlite_profile.py --readers 8 --writers 4 --seconds 5
+
+Writers create students through crud.create_student while readers look
+them up with crud.get_student. Reports operations per second and how many
+operations failed (e.g. "database is locked") for each profile.
+"""
+import argparse
+import itertools
+import pathlib
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeout
+
+from app import crud, schemas
+from app.database import Base, make_session_factory
+
+
+def run_profile(profile, readers, writers, seconds, seed_rows=1000):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/bench.db"
+        writer, reader, Session = make_session_factory(url, profile)
+        Base.metadata.create_all(writer)
+        with Session() as db:
+            for i in range(seed_rows):
+                crud.create_student(db, schemas.StudentCreate(name=f"seed{i}", email=f"seed{i}@bench.test"))
+
+        counts = Counter()
+        lock = threading.Lock()
+        emails = itertools.count()
+        stop = time.monotonic() + seconds
+
+        def write_loop():
+            while time.monotonic() < stop:
+                with Session() as db:
+                    try:
+                        crud.create_student(db, schemas.StudentCreate(name="w", email=f"w{next(emails)}@bench.test"))
+                        key = "writes"
+                    except (OperationalError, PoolTimeout):
+                        db.rollback()
+                        key = "write_errors"
+                with lock:
+                    counts[key] += 1
+
+        def read_loop():
+            while time.monotonic() < stop:
+                with Session() as db:
+                    try:
+                        crud.get_student(db, random.randint(1, seed_rows))
+                        key = "reads"
+                    except (OperationalError, PoolTimeout):
+                        key = "read_errors"
+                with lock:
+                    counts[key] += 1
+
+        threads = [threading.Thread(target=write_loop) for _ in range(writers)]
+        threads += [threading.Thread(target=read_loop) for _ in range(readers)]
+        start = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - start
+        writer.dispose()
+        reader.dispose()
+    return {
+        "reads_per_sec": counts["reads"] / elapsed,
+        "writes_per_sec": counts["writes"] / elapsed,
+        "read_errors": counts["read_errors"],
+        "write_errors": counts["write_errors"],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--seconds", type=float, default=5)
+    args = ap.parse_args()
+    print(f"{'profile':<12} {'reads/s':>10} {'writes/s':>10} {'read err':>9} {'write err':>10}")
+    for profile in ("default", "performance"):
+        r = run_profile(profile, args.readers, args.writers, args.seconds)
+        print(f"{profile:<12} {r['reads_per_sec']:>10.0f} {r['writes_per_sec']:>10.0f} {r['read_errors']:>9} {r['write_errors']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Load generator: drive every route in app/routes.py concurrently over real HTTP.
+
+    python benchmarks/load.py --requests 200 --concurrency 16
+
+The app runs under uvicorn in a background thread against a throwaway
+SQLite file (get_db is overridden, as in the tests). Each route gets its
+own scenario; the report shows throughput and p50/p95/p99 latency per route.
+"""
+import argparse
+from datetime import datetime, timedelta
+import itertools
+import json
+import pathlib
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import requests
+import uvicorn
+from requests.adapters import HTTPAdapter
+from sqlalchemy import insert, update
+
+from app import crud, models
+from app.cache import entity_cache
+from app.database import Base, make_session_factory
+from app.main import app
+from app.routes import get_db, router
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+class Seed:
+    """Rows created up front so every scenario has ids to work on; `take` hands out each id once."""
+
+    def __init__(self, db, n):
+        def add(model, rows):
+            result = db.execute(insert(model).returning(model.id), rows)
+            return list(result.scalars())
+
+        def people(prefix, count):
+            return [{"name": prefix, "email": f"{prefix}{i}@load.test"} for i in range(count)]
+
+        self.students = add(models.Student, people("read", 100))
+        self.delete_students = add(models.Student, people("del", n))
+        self.enroll_students = add(models.Student, people("enr", n))
+        self.bulk_students = add(models.Student, people("bulk", n * 10))
+        self.unenroll_students = add(models.Student, people("unenr", n))
+        self.teacher = add(models.Teacher, people("teacher", 1))[0]
+        self.delete_teachers = add(models.Teacher, people("delteacher", n))
+        courses = [{"title": "load", "capacity": 10 ** 9, "teacher_id": self.teacher} for _ in range(100 + n + 3)]
+        ids = add(models.Course, courses)
+        self.courses, self.delete_courses = ids[:100], ids[100:100 + n]
+        self.enroll_course, self.bulk_course, self.unenroll_course = ids[-3:]
+        db.execute(insert(models.Enrollment), [{"student_id": s, "course_id": self.unenroll_course} for s in self.unenroll_students])
+        # every read student takes the first read course, so rosters and schedules are non-empty
+        self.roster_course = self.courses[0]
+        db.execute(insert(models.Enrollment), [{"student_id": s, "course_id": self.roster_course} for s in self.students])
+        db.execute(update(models.Course).where(models.Course.id == self.roster_course).values(enrolled_count=len(self.students)))
+        scraped = [
+            {"title": f"Book {i}", "link": f"http://load.test/{i}", "price_minor": 1000 + i % 500, "currency": "GBP",
+             "scraped_at": datetime(2024, 1, 1) + timedelta(minutes=i)}
+            for i in range(1000 + n * 11)
+        ]
+        ids = add(models.ScrapedResource, scraped)
+        self.scraped, self.delete_scraped, self.bulk_delete_scraped = ids[:1000], ids[1000:1000 + n], ids[1000 + n:]
+        db.execute(insert(models.ScrapedChange), [
+            {"op": "insert", "resource_id": pid, "link": row["link"], "changed_at": datetime(2024, 1, 1)}
+            for pid, row in zip(ids, scraped)
+        ])
+        self.job = add(models.ImportJob, [{"status": "done", "total": 0, "created_at": datetime(2024, 1, 1)}])[0]
+        db.commit()
+        self.iters = {}
+        self.unique = itertools.count()
+        self.lock = threading.Lock()
+
+    def take(self, name):
+        with self.lock:
+            it = self.iters.setdefault(name, iter(getattr(self, name)))
+            return next(it)
+
+    def uid(self):
+        return next(self.unique)
+
+
+def scenarios(seed, base):
+    """route key -> function returning (method, path, kwargs for requests); `base` is the server URL."""
+    etags = {}
+
+    def conditional(path, **params):
+        # polls with the ETag of the first response, as a dashboard would; answered with 304
+        if path not in etags:
+            etags[path] = requests.get(base + path, params=params, timeout=60).headers["ETag"]
+        return ("GET", path, {"params": params, "headers": {"If-None-Match": etags[path]}})
+
+    def people(prefix, k=50):
+        u = seed.uid()
+        return [{"name": prefix, "email": f"{prefix}{u}-{i}@load.test"} for i in range(k)]
+
+    def people_csv(prefix, k=50):
+        return "name,email\n" + "".join(f"{p['name']},{p['email']}\n" for p in people(prefix, k))
+
+    def scraped_items(k=50):
+        u = seed.uid()
+        return [{"title": f"L{u}-{i}", "link": f"http://load.test/new/{u}/{i}", "price": "1.00"} for i in range(k)]
+
+    return {
+        "POST /students": lambda: ("POST", "/students", {"json": {"name": "n", "email": f"new{seed.uid()}@load.test"}}),
+        "POST /students:bulk": lambda: ("POST", "/students:bulk", {"json": people("bs")}),
+        "POST /students:bulk/stream": lambda: (
+            "POST", "/students:bulk/stream", {"data": people_csv("bsc"), "headers": {"Content-Type": "text/csv"}}),
+        "POST /teachers:bulk": lambda: ("POST", "/teachers:bulk", {"json": people("bt")}),
+        "POST /teachers:bulk/stream": lambda: (
+            "POST", "/teachers:bulk/stream", {"data": people_csv("btc"), "headers": {"Content-Type": "text/csv"}}),
+        "GET /students/{id}": lambda: ("GET", f"/students/{random.choice(seed.students)}", {}),
+        "DELETE /students/{id}": lambda: ("DELETE", f"/students/{seed.take('delete_students')}", {}),
+        "POST /teachers": lambda: ("POST", "/teachers", {"json": {"name": "n", "email": f"newt{seed.uid()}@load.test"}}),
+        "DELETE /teachers/{id}": lambda: ("DELETE", f"/teachers/{seed.take('delete_teachers')}", {}),
+        "POST /courses": lambda: ("POST", "/courses", {"json": {"title": "c", "capacity": 30, "teacher_id": seed.teacher}}),
+        "GET /courses/{id}": lambda: ("GET", f"/courses/{random.choice(seed.courses)}", {}),
+        "GET /courses/{id} (If-None-Match)": lambda: conditional(f"/courses/{seed.courses[1]}"),
+        "DELETE /courses/{id}": lambda: ("DELETE", f"/courses/{seed.take('delete_courses')}", {}),
+        "GET /courses/{id}/roster": lambda: ("GET", f"/courses/{seed.roster_course}/roster", {"params": {"limit": 50}}),
+        "GET /students/{id}/courses": lambda: ("GET", f"/students/{random.choice(seed.students)}/courses", {}),
+        "GET /metrics": lambda: ("GET", "/metrics", {}),
+        "GET /cache/stats": lambda: ("GET", "/cache/stats", {}),
+        "POST /students/{id}/enroll": lambda: (
+            "POST", f"/students/{seed.take('enroll_students')}/enroll", {"json": {"course_id": seed.enroll_course}}),
+        "POST /courses/{id}/enrollments:bulk": lambda: (
+            "POST", f"/courses/{seed.bulk_course}/enrollments:bulk",
+            {"json": {"student_ids": [seed.take("bulk_students") for _ in range(10)]}}),
+        "DELETE /students/{id}/enroll/{course_id}": lambda: (
+            "DELETE", f"/students/{seed.take('unenroll_students')}/enroll/{seed.unenroll_course}", {}),
+        "POST /import/scraped": lambda: ("POST", "/import/scraped", {"json": scraped_items()}),
+        # the job pool isn't started (lifespan is off), so this measures storing the payload
+        "POST /import/scraped?async=true": lambda: (
+            "POST", "/import/scraped", {"params": {"async": "true"}, "json": scraped_items()}),
+        "GET /jobs/{id}": lambda: ("GET", f"/jobs/{seed.job}", {}),
+        "POST /import/scraped/stream": lambda: (
+            "POST", "/import/scraped/stream",
+            {"data": "\n".join(json.dumps(it) for it in scraped_items()), "headers": {"Content-Type": "application/x-ndjson"}}),
+        "GET /scraped_resources": lambda: (
+            "GET", "/scraped_resources", {"params": {"limit": 50, "sort": "-price", "min_price": 1100, "max_price": 1300}}),
+        "GET /scraped_resources (If-None-Match)": lambda: conditional("/scraped_resources", limit=50),
+        "GET /scraped_resources/search": lambda: (
+            "GET", "/scraped_resources/search", {"params": {"q": f"book {random.randrange(1000)}"}}),
+        "GET /scraped_resources/changes": lambda: (
+            "GET", "/scraped_resources/changes",
+            {"params": {"since": crud.change_cursor(random.randrange(len(seed.scraped))), "limit": 100}}),
+        "GET /scraped_resources/changes (If-None-Match)": lambda: conditional("/scraped_resources/changes", limit=100),
+        # time until the stream is open; the response is closed straight away
+        "GET /scraped_resources/changes/stream": lambda: ("GET", "/scraped_resources/changes/stream", {"stream": True}),
+        "DELETE /scraped_resources": lambda: (
+            "DELETE", "/scraped_resources", {"params": {"ids": [seed.take("bulk_delete_scraped") for _ in range(10)]}}),
+        "DELETE /scraped_resources/{id}": lambda: ("DELETE", f"/scraped_resources/{seed.take('delete_scraped')}", {}),
+    }
+
+
+def route_keys():
+    return [f"{m} {r.path}" for r in router.routes for m in sorted(r.methods) if m != "HEAD"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run(requests_per_route=200, concurrency=16):
+    tmp = tempfile.TemporaryDirectory()
+    writer, reader, Session = make_session_factory(f"sqlite:///{tmp.name}/load.db")
+    Base.metadata.create_all(writer)
+    with Session() as db:
+        seed = Seed(db, requests_per_route)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    entity_cache.clear()
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    http = requests.Session()
+    http.mount("http://", HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency))
+    base = f"http://127.0.0.1:{port}"
+    plans = scenarios(seed, base)
+    missing = [key for key in route_keys() if key not in plans]
+    if missing:
+        print(f"warning: no load scenario for {', '.join(missing)}")
+
+    def call(make):
+        method, path, kwargs = make()
+        start = time.perf_counter()
+        try:
+            with http.request(method, base + path, timeout=60, **kwargs) as response:
+                status = response.status_code
+        except requests.RequestException:
+            status = 0
+        return status, time.perf_counter() - start
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for key, make in plans.items():
+                start = time.perf_counter()
+                outcomes = list(pool.map(lambda _: call(make), range(requests_per_route)))
+                elapsed = time.perf_counter() - start
+                latencies = [o[1] for o in outcomes]
+                results[key] = {
+                    "req_per_sec": requests_per_route / elapsed,
+                    "p50_ms": statistics.median(latencies) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    "errors": sum(1 for o in outcomes if not 200 <= o[0] < 400),
+                }
+    finally:
+        server.should_exit = True
+        thread.join()
+        http.close()
+        app.dependency_overrides.pop(get_db, None)
+        writer.dispose()
+        reader.dispose()
+        tmp.cleanup()
+    return results
+
+
+def print_report(results):
+    print(f"{'route':<45} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for key, r in results.items():
+        print(f"{key:<45} {r['req_per_sec']:>8.0f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>7}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--requests", type=int, default=200, help="requests per route")
+    ap.add_argument("--concurrency", type=int, default=16)
+    args = ap.parse_args()
+    print_report(run(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.robotparser
+from collections import Counter
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.5993.89 Safari/537.36"
+}
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `capacity` tokens."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # block until a token is available
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """One token bucket per host, so parallel workers stay polite to each site."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+
+def make_session(pool_size=10):
+    """requests.Session with a keep-alive connection pool sized for the worker count."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def site_root(url):
+    parts = urlparse(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class RobotsCache:
+    """Parsed robots.txt per host, downloaded once and reused until `ttl` seconds pass."""
+
+    def __init__(self, session, ttl=3600, user_agent="*", stats=None):
+        self.session = session
+        self.ttl = ttl
+        self.user_agent = user_agent
+        self.stats = stats if stats is not None else Counter()
+        self.entries = {}
+        self.host_locks = {}
+        self.lock = threading.Lock()
+
+    def _download(self, root):
+        rp = urllib.robotparser.RobotFileParser(root + "/robots.txt")
+        try:
+            response = self.session.get(root + "/robots.txt", timeout=10)
+        except requests.exceptions.RequestException as e:
+            print(f"Could not read {root}/robots.txt: {e}")
+            rp.allow_all = True
+            return rp
+        # same status handling as RobotFileParser.read()
+        if response.status_code in (401, 403):
+            rp.disallow_all = True
+        elif 400 <= response.status_code < 500:
+            rp.allow_all = True
+        else:
+            rp.parse(response.text.splitlines())
+        return rp
+
+    def allowed(self, url):
+        root = site_root(url)
+        with self.lock:
+            host_lock = self.host_locks.get(root)
+            if host_lock is None:
+                host_lock = self.host_locks[root] = threading.Lock()
+        # held while downloading so parallel workers don't all fetch the same file;
+        # a slow robots.txt only holds up workers bound for that host
+        with host_lock:
+            entry = self.entries.get(root)
+            hit = bool(entry) and entry[0] > time.monotonic()
+            if hit:
+                rp = entry[1]
+            else:
+                rp = self._download(root)
+                self.entries[root] = (time.monotonic() + self.ttl, rp)
+        with self.lock:
+            self.stats["robots_hits" if hit else "robots_misses"] += 1
+        return rp.can_fetch(self.user_agent, url)
+
+
+class ResponseCache:
+    """On-disk store of page bodies with their ETag / Last-Modified validators."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def load(self, url):
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, url, response):
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "body": response.text,
+        }
+        if not entry["etag"] and not entry["last_modified"]:
+            # nothing to revalidate with next time
+            return
+        path = self._path(url)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def retryable(error):
+    """True for failures worth another try later: no response at all, 429 or a 5xx."""
+    response = getattr(error, "response", None)
+    return response is None or response.status_code == 429 or response.status_code >= 500
+
+
+class Fetcher:
+    """Fetch layer shared by all workers: pooled session, robots policy, rate limit and revalidation cache."""
+
+    def __init__(self, concurrency=1, rate=1.0, cache_dir=None, robots_ttl=3600, timeout=10):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.stats = Counter()
+        self.session = make_session(self.concurrency)
+        self.limiter = HostRateLimiter(rate)
+        self.robots = RobotsCache(self.session, ttl=robots_ttl, stats=self.stats)
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.lock = threading.Lock()
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def allowed(self, url):
+        return self.robots.allowed(url)
+
+    def get(self, url):
+        """Return the page body, or None if the request failed."""
+        return self.fetch(url)[0]
+
+    def fetch(self, url):
+        """Return (body, None), or (None, the requests exception) if the request failed."""
+        entry = self.cache.load(url) if self.cache else None
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        self.limiter.wait(url)
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry:
+                self._count("http_hits")
+                return entry["body"], None
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching {url}: {e}")
+            self._count("http_errors")
+            return None, e
+        self._count("http_misses")
+        if self.cache:
+            self.cache.store(url, response)
+        return response.text, None
+
+    def report(self):
+        s = self.stats
+        print(f"robots.txt cache: {s['robots_hits']} hits, {s['robots_misses']} misses")
+        if self.cache:
+            print(f"HTTP cache: {s['http_hits']} hits (304), {s['http_misses']} misses, {s['http_errors']} errors")
+        else:
+            print(f"HTTP: {s['http_misses']} fetched, {s['http_errors']} errors (cache disabled)")
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+Task = namedtuple("Task", "url kind depth attempts")
+
+PENDING, IN_FLIGHT, DONE, FAILED = "pending", "in_flight", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_frontier_next ON frontier (state, priority, seq);
+"""
+
+
+class Frontier:
+    """Crawl queue checkpointed to a SQLite file, so a killed crawl can pick up where it stopped.
+
+    Every URL is pending, in_flight, done or failed. `claim` hands out the
+    pending URL with the lowest priority number (then the oldest) whose retry
+    time has come. A failed attempt goes back to pending with an exponential
+    backoff until `max_attempts`, then stays failed. Each change is committed
+    at once; on resume the URLs left in flight by the dead process are
+    pending again.
+    """
+
+    def __init__(self, path, max_attempts=4, backoff=1.0, max_backoff=60.0):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """Forget every URL, for a fresh crawl."""
+        with self.lock:
+            self.conn.execute("DELETE FROM frontier")
+
+    def requeue_in_flight(self):
+        """Make the URLs a previous (killed) run had claimed pending again; returns how many."""
+        with self.lock:
+            return self.conn.execute(
+                "UPDATE frontier SET state = ? WHERE state = ?", (PENDING, IN_FLIGHT)).rowcount
+
+    def add(self, url, kind="catalogue", depth=0, priority=0):
+        """Queue `url` unless it is already known (in any state); returns True if it was added."""
+        with self.lock:
+            return self.conn.execute(
+                "INSERT OR IGNORE INTO frontier (url, kind, depth, priority, state) VALUES (?, ?, ?, ?, ?)",
+                (url, kind, depth, priority, PENDING),
+            ).rowcount == 1
+
+    def claim(self):
+        """Mark the next due URL in flight and return it as a Task, or None if nothing is due now."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT seq, url, kind, depth, attempts FROM frontier WHERE state = ? AND next_attempt <= ? "
+                "ORDER BY priority, seq LIMIT 1",
+                (PENDING, time.time()),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE frontier SET state = ? WHERE seq = ?", (IN_FLIGHT, row[0]))
+        return Task(*row[1:])
+
+    def wait_time(self):
+        """Seconds until the next pending URL is due; 0 if some are in flight; None when the crawl is finished."""
+        with self.lock:
+            due = self.conn.execute("SELECT MIN(next_attempt) FROM frontier WHERE state = ?", (PENDING,)).fetchone()[0]
+            if due is not None:
+                return max(0.0, due - time.time())
+            busy = self.conn.execute("SELECT 1 FROM frontier WHERE state = ? LIMIT 1", (IN_FLIGHT,)).fetchone()
+        return 0.0 if busy else None
+
+    def done(self, url):
+        with self.lock:
+            self.conn.execute("UPDATE frontier SET state = ?, error = NULL WHERE url = ?", (DONE, url))
+
+    def fail(self, url, error, retry=True):
+        """Record a failed attempt; retried after backoff * 2**(attempts - 1) seconds unless out of attempts."""
+        with self.lock:
+            attempts = self.conn.execute("SELECT attempts FROM frontier WHERE url = ?", (url,)).fetchone()[0] + 1
+            if retry and attempts < self.max_attempts:
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+                state, next_attempt = PENDING, time.time() + delay
+            else:
+                state, next_attempt = FAILED, 0
+            self.conn.execute(
+                "UPDATE frontier SET state = ?, attempts = ?, next_attempt = ?, error = ? WHERE url = ?",
+                (state, attempts, next_attempt, str(error), url),
+            )
+
+    def counts(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state").fetchall()
+        return {state: 0 for state in (PENDING, IN_FLIGHT, DONE, FAILED)} | dict(rows)
+
+    def line(self):
+        c = self.counts()
+        return f"frontier: {c[DONE]} done, {c[FAILED]} failed, {c[PENDING] + c[IN_FLIGHT]} left"
+
+    def close(self):
+        self.conn.close()
+
+
+class FrontierSource:
+    """Pipeline page source backed by a Frontier: waits for retries and for URLs the parse stage may still add."""
+
+    def __init__(self, frontier, stop, poll=0.05):
+        self.frontier = frontier
+        self.stop = stop
+        self.poll = poll
+
+    def claim(self):
+        while not self.stop.is_set():
+            task = self.frontier.claim()
+            if task is not None:
+                return task
+            wait = self.frontier.wait_time()
+            if wait is None:
+                return None
+            self.stop.wait(min(max(wait, 0.01), self.poll))
+        return None
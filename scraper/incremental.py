@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import threading
+
+
+class PageHashes:
+    """Content hash of every catalogue page seen by earlier runs, stored as a JSON object {url: sha256}."""
+
+    def __init__(self, hashes=None):
+        self.hashes = dict(hashes or {})
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                hashes = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        return cls(hashes if isinstance(hashes, dict) else {})
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.hashes, f, indent=0, sort_keys=True)
+        os.replace(tmp, path)
+
+    def unchanged(self, url, digest):
+        return self.hashes.get(url) == digest
+
+    def record(self, url, digest):
+        self.hashes[url] = digest
+
+
+class IncrementalCrawl:
+    """Decides, page by page and in page order, whether to parse and when to stop paginating.
+
+    A page whose HTML hashes the same as last run is skipped without parsing.
+    A page is "known" when it is skipped or none of its links are new (the
+    seen index has already dropped stored ones); after `stop_after` known
+    pages in a row `stop` is set, which stops the fetch workers taking more.
+    """
+
+    def __init__(self, hashes, stop_after=3, stop=None):
+        self.hashes = hashes
+        self.stop_after = stop_after
+        self.stop = stop if stop is not None else threading.Event()
+        self.skipped = self.parsed = 0
+        self.known_run = 0
+
+    def parse(self, url, html, parse_page):
+        digest = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        if self.hashes.unchanged(url, digest):
+            self.skipped += 1
+            books = []
+        else:
+            books = parse_page(html)
+            # only after a successful parse, so a page that failed is parsed again next run
+            self.hashes.record(url, digest)
+            self.parsed += 1
+        self.known_run = 0 if books else self.known_run + 1
+        if self.stop_after and self.known_run >= self.stop_after:
+            self.stop.set()
+        return books
+
+    def line(self, fetched):
+        line = f"incremental: {fetched} pages fetched, {self.skipped} skipped (unchanged), {self.parsed} parsed"
+        if self.stop.is_set():
+            line += f"; stopped after {self.stop_after} pages in a row without new links"
+        return line
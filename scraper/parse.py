@@ -0,0 +1,77 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+except ImportError:  # optional, see get_parser()
+    lxml = None
+
+
+# Every backend returns the same raw records for each article.product_pod:
+# {"href", "image_src", "alt", "price"}; missing parts are None.
+
+class SoupParser:
+    """Full html.parser tree with CSS selects; slowest, kept as the reference implementation."""
+    name = "soup"
+
+    def _soup(self, html):
+        return BeautifulSoup(html, "html.parser")
+
+    def extract(self, html):
+        records = []
+        for article in self._soup(html).select("article.product_pod"):
+            link = article.select_one("h3 a[href]")
+            img = article.select_one(".image_container img")
+            price = article.select_one("p.price_color")
+            records.append({
+                "href": link.get("href") if link else None,
+                "image_src": img.get("src", "") if img else None,
+                "alt": img.get("alt", "") if img else None,
+                "price": price.get_text(strip=True) if price else None,
+            })
+        return records
+
+
+class StrainedSoupParser(SoupParser):
+    """html.parser restricted by a SoupStrainer, so only the product pods become a tree."""
+    name = "strained"
+    strainer = SoupStrainer("article", class_="product_pod")
+
+    def _soup(self, html):
+        return BeautifulSoup(html, "html.parser", parse_only=self.strainer)
+
+
+class LxmlParser:
+    """lxml.html with XPath; needs the optional lxml package."""
+    name = "lxml"
+    pods = "//article[contains(concat(' ', normalize-space(@class), ' '), ' product_pod ')]"
+
+    @staticmethod
+    def _first(node, path):
+        found = node.xpath(path)
+        return found[0] if found else None
+
+    def extract(self, html):
+        records = []
+        for article in lxml.html.fromstring(html).xpath(self.pods):
+            link = self._first(article, ".//h3//a[@href]")
+            img = self._first(article, ".//*[contains(concat(' ', normalize-space(@class), ' '), ' image_container ')]//img")
+            price = self._first(article, ".//p[contains(concat(' ', normalize-space(@class), ' '), ' price_color ')]")
+            records.append({
+                "href": link.get("href") if link is not None else None,
+                "image_src": img.get("src", "") if img is not None else None,
+                "alt": img.get("alt", "") if img is not None else None,
+                "price": price.text_content().strip() if price is not None else None,
+            })
+        return records
+
+
+PARSERS = {p.name: p for p in (SoupParser, StrainedSoupParser, LxmlParser) if p is not LxmlParser or lxml}
+
+
+def get_parser(name=None):
+    """Return a parser backend by name; defaults to lxml when installed, else the strained soup parser."""
+    if name is None:
+        name = "lxml" if "lxml" in PARSERS else "strained"
+    if name not in PARSERS:
+        raise ValueError(f"Unknown or unavailable parser backend: {name}")
+    return PARSERS[name]()
@@ -0,0 +1,307 @@
+import json
+import os
+import itertools
+import queue
+import textwrap
+import threading
+import time
+from datetime import datetime
+
+DONE = object()
+
+
+def _json_default(value):
+    # scraped_at is a datetime; write it as ISO 8601
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.wall = 0.0
+        self.lock = threading.Lock()
+
+    def line(self):
+        rate = self.items_out / self.wall if self.wall else 0.0
+        return (f"{self.name:<6} in={self.items_in:<6} out={self.items_out:<6} errors={self.errors:<3} "
+                f"busy={self.busy:7.2f}s wall={self.wall:7.2f}s {rate:9.1f} items/s")
+
+
+class JsonlWriter:
+    """One JSON object per line, flushed after every batch so a crash keeps what was written."""
+    name = "jsonl"
+
+    def __init__(self, path, append=False):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.f = open(path, "a" if append else "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, books):
+        for book in books:
+            self.f.write(json.dumps(book, ensure_ascii=False, default=_json_default) + "\n")
+        self.count += len(books)
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+        print(f"Data saved to {self.path}")
+
+
+def _read_array(path):
+    """The items of a JSON array written by JsonArrayWriter, or [] if there is no such file."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return []
+    if not text.strip():
+        return []
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # a killed run never wrote the closing bracket: keep everything up to the last complete item
+        end = text.rfind("\n  }")
+        return json.loads(text[:end + 4] + "\n]") if end != -1 else []
+
+
+class JsonArrayWriter(JsonlWriter):
+    """Streams the same indented JSON array that json.dump(data, indent=2) produced.
+
+    With append=True the items already in the file are written back first, so a resumed run extends the array.
+    """
+    name = "json"
+
+    def __init__(self, path, append=False):
+        kept = _read_array(path) if append else []
+        super().__init__(path)
+        self.in_file = 0
+        self._dump(kept)
+        self.f.flush()
+
+    def _dump(self, books):
+        for book in books:
+            self.f.write("[\n" if self.in_file == 0 else ",\n")
+            self.f.write(textwrap.indent(json.dumps(book, indent=2, ensure_ascii=False, default=_json_default), "  "))
+            self.in_file += 1
+
+    def write(self, books):
+        self._dump(books)
+        self.count += len(books)
+        self.f.flush()
+
+    def close(self):
+        self.f.write("\n]" if self.in_file else "[]")
+        super().close()
+
+
+class DbWriter:
+    """Buffers items and hands them to `save` (e.g. save_to_db) every `batch_size` rows."""
+    name = "db"
+
+    def __init__(self, save, batch_size=100):
+        self.save = save
+        self.batch_size = batch_size
+        self.buffer = []
+        self.inserted = 0
+
+    def write(self, books):
+        self.buffer.extend(books)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.inserted += self.save(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+
+
+class CollectSink:
+    """Keeps every item in memory; for callers that want the list back."""
+    name = "collect"
+
+    def __init__(self):
+        self.items = []
+
+    def write(self, books):
+        self.items.extend(books)
+
+    def close(self):
+        pass
+
+
+class RangeSource:
+    """Pages 0 .. pages-1, each handed out once."""
+
+    def __init__(self, pages):
+        self.todo = queue.Queue()
+        for i in range(pages):
+            self.todo.put(i)
+
+    def claim(self):
+        try:
+            return self.todo.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class Pipeline:
+    """fetch -> parse -> sink -> sink ... threads connected by bounded queues.
+
+    `pages` is a page count or a source whose `claim()` returns the next task
+    (e.g. a frontier URL), or None when there is nothing left. `fetch_page(task)`
+    returns the page HTML (or None) and runs on `workers` threads;
+    `parse_page(task, html)` returns a list of items and runs on one thread, in
+    the order the tasks were claimed. Each sink gets every parsed batch, in order. A full
+    queue blocks the stage feeding it, so a slow DB write throttles fetching
+    instead of piling pages up in memory; likewise a slow page caps how far
+    the other fetch workers run ahead of it. Setting `stop` ends the crawl early:
+    no further pages are fetched and pages already in flight are dropped.
+    """
+
+    def __init__(self, fetch_page, parse_page, pages, sinks, workers=1, queue_size=8, stop=None):
+        self.fetch_page = fetch_page
+        self.parse_page = parse_page
+        self.source = RangeSource(pages) if isinstance(pages, int) else pages
+        self.sinks = list(sinks)
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.stop = stop if stop is not None else threading.Event()
+        self.stats = [StageStats("fetch"), StageStats("parse")] + [StageStats(s.name) for s in self.sinks]
+
+    def _fetch(self, window, outbox, stats):
+        claimed = itertools.count()
+        claim_lock = threading.Lock()
+
+        def worker():
+            while True:
+                # a slot per page claimed but not yet emitted in order, so one slow page caps the reorder buffer
+                window.acquire()
+                if self.stop.is_set():
+                    window.release()
+                    return
+                # numbered as claimed, so the parse stage can restore claim order
+                with claim_lock:
+                    task = self.source.claim()
+                    if task is None:
+                        window.release()
+                        return
+                    n = next(claimed)
+                start = time.perf_counter()
+                try:
+                    html = self.fetch_page(task)
+                except Exception as e:
+                    print(f"Error fetching {task}: {e}")
+                    html = None
+                with stats.lock:
+                    stats.items_in += 1
+                    stats.busy += time.perf_counter() - start
+                    if html:
+                        stats.items_out += 1
+                    else:
+                        stats.errors += 1
+                outbox.put((n, task, html))
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        outbox.put(DONE)
+
+    def _parse(self, window, inbox, outbox, stats):
+        # pages arrive in completion order; emit them in claim order
+        pending, next_page = {}, 0
+        while True:
+            item = inbox.get()
+            if item is DONE:
+                break
+            pending[item[0]] = item[1:]
+            while next_page in pending:
+                task, html = pending.pop(next_page)
+                next_page += 1
+                window.release()
+                # keep draining after a stop so fetch workers never block on a full queue
+                if self.stop.is_set():
+                    continue
+                stats.items_in += 1
+                if not html:
+                    continue
+                start = time.perf_counter()
+                try:
+                    books = self.parse_page(task, html)
+                except Exception as e:
+                    print(f"Error parsing {task}: {e}")
+                    stats.errors += 1
+                    books = []
+                stats.busy += time.perf_counter() - start
+                if books:
+                    stats.items_out += len(books)
+                    outbox.put(books)
+        outbox.put(DONE)
+
+    def _sink(self, sink, inbox, outbox, stats):
+        while True:
+            books = inbox.get()
+            if books is DONE:
+                break
+            stats.items_in += len(books)
+            start = time.perf_counter()
+            try:
+                sink.write(books)
+                stats.items_out += len(books)
+            except Exception as e:
+                print(f"Error in {sink.name} stage: {e}")
+                stats.errors += 1
+            stats.busy += time.perf_counter() - start
+            if outbox is not None:
+                outbox.put(books)
+        try:
+            sink.close()
+        except Exception as e:
+            print(f"Error closing {sink.name} stage: {e}")
+            stats.errors += 1
+        if outbox is not None:
+            outbox.put(DONE)
+
+    def run(self):
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stats) - 1)]
+        # bounds the pages between claim and in-order emit: one per worker plus a full fetch queue
+        window = threading.BoundedSemaphore(self.workers + self.queue_size)
+        targets = [
+            (self._fetch, (window, queues[0])),
+            (self._parse, (window, queues[0], queues[1] if len(queues) > 1 else queue.Queue())),
+        ]
+        for n, sink in enumerate(self.sinks):
+            outbox = queues[n + 2] if n + 2 < len(queues) else None
+            targets.append((self._sink, (sink, queues[n + 1], outbox)))
+
+        threads = []
+        for (target, args), stats in zip(targets, self.stats):
+            def run_stage(target=target, args=args, stats=stats):
+                start = time.perf_counter()
+                target(*args, stats)
+                stats.wall = time.perf_counter() - start
+            threads.append(threading.Thread(target=run_stage, name=stats.name, daemon=True))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.stats
+
+    def report(self):
+        for stats in self.stats:
+            print(stats.line())
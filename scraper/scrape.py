@@ -1,11 +1,10 @@
-import requests
-from bs4 import BeautifulSoup
-import urllib.robotparser
-import time
 import argparse
 import os
 import sys
 import pathlib
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urljoin
 
 # Ensure project root is on sys.path so we can import the app package
 ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
@@ -19,128 +18,133 @@ except Exception:
 
 from sqlalchemy.exc import IntegrityError
 from app.database import SessionLocal
-from app import models
+from app import crud
+from app.schemas import parse_price
+from scraper.fetch import Fetcher, retryable
+from scraper.frontier import Frontier, FrontierSource
+from scraper.incremental import IncrementalCrawl, PageHashes
+from scraper.parse import PARSERS, get_parser
+from scraper.pipeline import CollectSink, DbWriter, JsonArrayWriter, JsonlWriter, Pipeline
+from scraper.seen import SeenIndex
 
 
 WEBSITES = "https://books.toscrape.com/"
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.5993.89 Safari/537.36"
-}
+CACHE_DIR = os.path.join(str(ROOT_DIR), ".cache", "http")
+SEEN_INDEX = os.path.join(str(ROOT_DIR), ".cache", "seen.bloom")
+PAGE_HASHES = os.path.join(str(ROOT_DIR), ".cache", "pages.json")
+FRONTIER = os.path.join(str(ROOT_DIR), ".cache", "frontier.db")
 
-scraped_urls = []
+# frontier priorities: lower is claimed first
+CATALOGUE_PRIORITY = 0
+DETAIL_PRIORITY = 1
+
+DEFAULT_PARSER = get_parser()
+
+# links handled in this run; scrape_and_save swaps in a persisted index with --db
+seen_urls = SeenIndex()
 
 # Simple CLI setup
 def setup_cli():
     parser = argparse.ArgumentParser(description='Book Scraper')
     parser.add_argument('--pages', type=int, default=1, help='Number of pages to scrape')
     parser.add_argument('--db', action='store_true', help='Save to database')
+    parser.add_argument('--concurrency', type=int, default=4, help='Number of pages fetched in parallel')
+    parser.add_argument('--rate', type=float, default=1.0, help='Max requests per second per host (0 = unlimited)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='Directory for the conditional-request response cache')
+    parser.add_argument('--no-cache', action='store_true', help='Always download pages in full')
+    parser.add_argument('--robots-ttl', type=int, default=3600, help='Seconds a host\'s robots.txt is reused')
+    parser.add_argument('--seen-index', default=SEEN_INDEX, help='Bloom filter of links stored by earlier runs (used with --db)')
+    parser.add_argument('--format', choices=['json', 'jsonl'], default='json', help='Output file format')
+    parser.add_argument('--output', help='Output file (default samples/scraped.json or .jsonl)')
+    parser.add_argument('--parser', choices=sorted(PARSERS), default=DEFAULT_PARSER.name, help='HTML parser backend')
+    parser.add_argument('--incremental', action='store_true', help='Skip pages unchanged since the last run and stop at known content')
+    parser.add_argument('--page-hashes', default=PAGE_HASHES, help='Content hash per catalogue page (used with --incremental)')
+    parser.add_argument('--stop-after', type=int, default=3, help='With --incremental, stop after this many pages in a row without new links (0 = never)')
+    parser.add_argument('--frontier', default=FRONTIER, help='SQLite file checkpointing the crawl queue (empty = no checkpoint, plain page loop)')
+    parser.add_argument('--resume', action='store_true', help='Continue the crawl recorded in --frontier instead of starting over')
+    parser.add_argument('--max-depth', type=int, default=0, help='Also queue the detail page of each new book when 1 or more')
+    parser.add_argument('--retries', type=int, default=3, help='Retries per URL after a transient fetch error')
+    parser.add_argument('--backoff', type=float, default=1.0, help='Seconds before the first retry; doubles on each further retry')
     return parser.parse_args()
 
-def respect_robots_txt(url,pages):
-    rp = urllib.robotparser.RobotFileParser()
-    rp.set_url(url + "robots.txt")
-    rp.read()
-    flag=rp.can_fetch("*", url)
-    print(f"Robots.txt allows scraping: {url} , page {pages+1}")
+def respect_robots_txt(url, pages, fetcher):
+    flag = fetcher.allowed(url)
     if flag:
-        return True
-    else:
-        return False
+        print(f"Robots.txt allows scraping: {url} , page {pages+1}")
+    return flag
 
 # Fetch HTML content of a URL
-def fetch_data(url,i):
-    try:
-        if respect_robots_txt(url,i):
-            print(f"Fetching data from {url} , page {i+1}")
-            response = requests.get(url, headers=HEADERS, timeout=10)  # Added timeout to avoid hanging
-            response.raise_for_status()
-            return response.text
-        else:
-            print(f"Skipping page {i+1} because it is blocked by robots.txt")
-            return None
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching {url}: {e}")
+def fetch_data(url, i, fetcher):
+    if respect_robots_txt(url, i, fetcher):
+        print(f"Fetching data from {url} , page {i+1}")
+        return fetcher.get(url)
+    else:
+        print(f"Skipping page {i+1} because it is blocked by robots.txt")
         return None
 
-
+def page_url(website, i):
+    if i == 0:
+        return website
+    return website.rstrip('/') + f"/catalogue/page-{i+1}.html"
 
 # Extract book data from books.toscrape.com
-def get_book_data(website,i):
-    if i==0:
-        html = fetch_data(website,i)
-    else:
-        html = fetch_data(website + f"/catalogue/page-{i+1}.html",i)
+def get_book_data(website, i, fetcher, parser=None, seen=None):
+    html = fetch_data(page_url(website, i), i, fetcher)
     if not html:
         print(f"Failed to fetch HTML from {website}")
         return []
+    return parse_book_data(html, page_url(website, i), parser, seen)
 
-    soup = BeautifulSoup(html, "html.parser")
-    books = []
+def absolute_url(base_url, url):
+    # hrefs are relative to the page they are on ("../media/...", "a-light-in-the-attic_1000/index.html")
+    return urljoin(base_url, url)
+
+def parse_book_data(html, base_url, parser=None, seen=None):
+    """Build items for the books on a catalogue page; `base_url` is the page's URL, which relative links resolve against."""
+    parser = parser or DEFAULT_PARSER
+    seen = seen if seen is not None else seen_urls
+    records = {}
 
-    # Select each book article
-    for article in soup.select("article.product_pod"):
+    # One raw record per article.product_pod, keyed by its absolute link
+    for record in parser.extract(html):
+        if record["href"]:
+            records.setdefault(absolute_url(base_url, record["href"]), record)
+
+    # Drop links already handled before building any item dicts
+    books = []
+    scraped_at = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    for full_link in seen.filter_new(list(records)):
+        record = records[full_link]
         try:
-            # Extract link
-            link_element = article.select_one("h3 a[href]")
-            if not link_element:
-                continue
-                
-            link = link_element.get("href")
-            full_link = link if link.startswith("http") else website.rstrip('/') + '/' + link.lstrip('/')
-            
             # Extract image and alt text
-            img_element = article.select_one(".image_container img")
-            image_url = ""
-            alt_text = ""
-            if img_element:
-                image_url = img_element.get("src", "")
-                if image_url and not image_url.startswith("http"):
-                    image_url = website.rstrip('/') + '/' + image_url.lstrip('/')
-                alt_text = img_element.get("alt", "")
-            
-            # Extract price
-            price_element = article.select_one("p.price_color")
-            price = price_element.get_text(strip=True) if price_element else "No price"
-            
-            # Skip if already scraped
-            if full_link not in scraped_urls:
-                book_data = {
-                    "title": alt_text,  # Alt text contains the book title
-                    "link": full_link,
-                    "image_url": image_url,
-                    "alt_text": alt_text,
-                    "price": price.replace("£", "").replace("Â", "") if price != "No price" else price,
-                    "scraped_at": time.strftime("%Y-%m-%d %H:%M:%S")
-                }
-                
-                books.append(book_data)
-                scraped_urls.append(full_link)
-                
+            image_url = record["image_src"] or ""
+            if image_url:
+                image_url = absolute_url(base_url, image_url)
+            alt_text = record["alt"] or ""
+
+            # Price as integer minor units + currency code ("£51.77" -> 5177, "GBP")
+            price_minor, currency = parse_price(record["price"])
+
+            books.append({
+                "title": alt_text,  # Alt text contains the book title
+                "link": full_link,
+                "image_url": image_url,
+                "alt_text": alt_text,
+                "price_minor": price_minor,
+                "currency": currency,
+                "scraped_at": scraped_at,
+            })
         except Exception as e:
             print(f"Error processing book: {e}")
             continue
 
     return books
 
-def save_to_json(data, filename="samples/scraped.json"):
-    """Save scraped data to JSON file in scraper folder"""
-    import json
-    
-    try:
-        # Resolve path relative to project root if not absolute
-        if not os.path.isabs(filename):
-            filename = os.path.join(str(ROOT_DIR), filename)
-        # Ensure destination directory exists
-        directory = os.path.dirname(filename)
-        if directory and not os.path.exists(directory):
-            os.makedirs(directory, exist_ok=True)
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"Data saved to {filename}")
-        return data
-    except Exception as e:
-        print(f"Error saving JSON: {e}")
-        return None
+def output_path(filename):
+    """Resolve an output path relative to the project root."""
+    if not os.path.isabs(filename):
+        filename = os.path.join(str(ROOT_DIR), filename)
+    return filename
 
 def save_to_db(data):
     """Insert scraped items into scraped_resources using the app's DB."""
@@ -148,59 +152,167 @@ def save_to_db(data):
         print("No data to save to DB")
         return 0
     session = SessionLocal()
-    inserted = 0
     try:
-        for item in data:
-            link = item.get("link")
-            if not link:
-                continue
-            # skip if exists
-            exists = session.query(models.ScrapedResource).filter(models.ScrapedResource.link == link).first()
-            if exists:
-                continue
-            row = models.ScrapedResource(
-                title=item.get("title", ""),
-                link=link,
-                image_url=item.get("image_url", ""),
-                price=item.get("price", ""),
-                scraped_at=item.get("scraped_at", ""),
-            )
-            session.add(row)
-            inserted += 1
-        session.commit()
+        inserted = len(crud.bulk_insert_scraped(session, data))
         print(f"Inserted {inserted} new rows into scraped_resources")
         return inserted
     except IntegrityError as ie:
         session.rollback()
         print(f"Integrity error inserting rows: {ie}")
-        return inserted
+        return 0
     except Exception as e:
         session.rollback()
         print(f"Error saving to DB: {e}")
-        return inserted
+        return 0
     finally:
         session.close()
 
 
+def scrape_pages(website, pages, fetcher, parser=None, seen=None, sinks=(), queue_size=8, incremental=None,
+                 frontier=None, max_depth=0):
+    """Run the fetch -> parse -> sinks pipeline and return the per-stage stats.
+
+    With an IncrementalCrawl, unchanged pages are not parsed and the crawl
+    stops once it runs into pages without new links.
+
+    With a Frontier, the catalogue pages are queued in it (URLs it already
+    knows keep their state) and the crawl runs off the frontier: failed
+    fetches are retried with backoff, and while a page's depth is below
+    `max_depth` the detail page of every new book is queued behind the
+    catalogue pages.
+    """
+    stop = incremental.stop if incremental is not None else threading.Event()
+
+    def parse_catalogue(url, html):
+        if incremental is None:
+            return parse_book_data(html, url, parser, seen)
+        return incremental.parse(url, html, lambda html: parse_book_data(html, url, parser, seen))
+
+    if frontier is None:
+        source = pages
+
+        def fetch_page(i):
+            print(f"Scraping page {i+1}...")
+            html = fetch_data(page_url(website, i), i, fetcher)
+            if not html:
+                print(f"Failed to fetch HTML from {website}")
+            return html
+
+        def parse_page(i, html):
+            return parse_catalogue(page_url(website, i), html)
+    else:
+        for i in range(pages):
+            frontier.add(page_url(website, i), "catalogue", 0, CATALOGUE_PRIORITY)
+        source = FrontierSource(frontier, stop)
+
+        # every claimed URL has to end up done or failed, or the frontier never drains
+        def fetch_page(task):
+            if not fetcher.allowed(task.url):
+                print(f"Skipping {task.url}: blocked by robots.txt")
+                frontier.fail(task.url, "blocked by robots.txt", retry=False)
+                return None
+            print(f"Fetching {task.kind} page {task.url}")
+            try:
+                html, error = fetcher.fetch(task.url)
+            except Exception as e:
+                html, error = None, e
+            if error is not None:
+                frontier.fail(task.url, error, retry=retryable(error))
+            elif not html:
+                frontier.done(task.url)
+            return html
+
+        def parse_page(task, html):
+            if task.kind == "detail":
+                # detail pages add nothing to the item fields yet; fetching them fills the HTTP cache
+                frontier.done(task.url)
+                return []
+            try:
+                books = parse_catalogue(task.url, html)
+            except Exception as e:
+                frontier.fail(task.url, e, retry=False)
+                raise
+            if task.depth < max_depth:
+                for book in books:
+                    frontier.add(book["link"], "detail", task.depth + 1, DETAIL_PRIORITY)
+            frontier.done(task.url)
+            return books
+
+    # parsing runs on a single pipeline thread, so the seen index needs no locking
+    pipeline = Pipeline(
+        fetch_page,
+        parse_page,
+        source,
+        sinks,
+        workers=fetcher.concurrency,
+        queue_size=queue_size,
+        stop=stop,
+    )
+    return pipeline.run()
+
+def collect_pages(website, pages, fetcher, parser=None, seen=None):
+    """Fetch and parse catalogue pages, returning every book in page order."""
+    sink = CollectSink()
+    scrape_pages(website, pages, fetcher, parser, seen, [sink])
+    return sink.items
+
 # Main scraping function
-def scrape_and_save(websites, pages=1, use_db=False):
-    all_data = []
-    for i in range(pages):
-        print(f"Scraping page {i+1}...")
-        books = get_book_data(websites,i)
-        all_data.extend(books)
-        if i < pages - 1:
-            time.sleep(1)
-    
-    if all_data:
-        data=save_to_json(all_data)
-        if use_db:
-            save_to_db(data)
+def scrape_and_save(websites, pages=1, use_db=False, concurrency=1, rate=1.0, cache_dir=CACHE_DIR, robots_ttl=3600, parser=None, seen_index=SEEN_INDEX, output_format="json", output=None, incremental=False, page_hashes=PAGE_HASHES, stop_after=3, frontier_path=FRONTIER, resume=False, max_depth=0, retries=3, backoff=1.0):
+    fetcher = Fetcher(concurrency=concurrency, rate=rate, cache_dir=cache_dir, robots_ttl=robots_ttl)
+    frontier = Frontier(frontier_path, max_attempts=retries + 1, backoff=backoff) if frontier_path else None
+    if frontier is not None:
+        if resume:
+            print(f"Resuming crawl: {frontier.requeue_in_flight()} in-flight URLs requeued; {frontier.line()}")
         else:
-            print(f"Data is not saved to database")
-        print(f"Total: {len(all_data)} books scraped!")
+            frontier.reset()
+    session = SessionLocal() if use_db else None
+    seen = seen_urls
+    if use_db and seen_index:
+        # links stored by earlier runs are skipped before they are parsed into items
+        seen = SeenIndex.open(
+            seen_index,
+            confirm=lambda links: crud.existing_links(session, links),
+            seed=crud.iter_scraped_links(session),
+        )
+    elif use_db and incremental:
+        # the early stop has to recognize stored links even without the Bloom filter
+        seen = SeenIndex(confirm=lambda links: crud.existing_links(session, links))
+    crawl = IncrementalCrawl(PageHashes.load(page_hashes), stop_after) if incremental else None
+    writer_cls = JsonlWriter if output_format == "jsonl" else JsonArrayWriter
+    # a resumed run extends the file the interrupted run was writing
+    writer = writer_cls(output_path(output or f"samples/scraped.{output_format}"), append=resume)
+    sinks = [writer]
+    if use_db:
+        sinks.append(DbWriter(save_to_db))
+    else:
+        print(f"Data is not saved to database")
+    try:
+        stats = scrape_pages(websites, pages, fetcher, get_parser(parser), seen, sinks, incremental=crawl,
+                             frontier=frontier, max_depth=max_depth)
+    finally:
+        fetcher.close()
+        if frontier is not None:
+            print(frontier.line())
+            frontier.close()
+        if session is not None:
+            session.close()
+
+    if writer.count:
+        print(f"Total: {writer.count} books scraped!")
     else:
         print("No data scraped")
+    if seen is not seen_urls:
+        seen.save(seen_index)
+    if crawl is not None:
+        # a page whose items failed to save must be parsed again next run
+        if any(stage.errors for stage in stats[2:]):
+            print("Page hashes not saved: an output stage reported errors")
+        else:
+            crawl.hashes.save(page_hashes)
+        print(crawl.line(stats[0].items_out))
+    for stage in stats:
+        print(stage.line())
+    fetcher.report()
 
 
 
@@ -209,5 +321,25 @@ if __name__ == "__main__":
     args = setup_cli()
     
     # Run scraper with arguments
-    scrape_and_save(WEBSITES, pages=args.pages, use_db=args.db)
+    scrape_and_save(
+        WEBSITES,
+        pages=args.pages,
+        use_db=args.db,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        robots_ttl=args.robots_ttl,
+        parser=args.parser,
+        seen_index=args.seen_index,
+        output_format=args.format,
+        output=args.output,
+        incremental=args.incremental,
+        page_hashes=args.page_hashes,
+        stop_after=args.stop_after,
+        frontier_path=args.frontier,
+        resume=args.resume,
+        max_depth=args.max_depth,
+        retries=args.retries,
+        backoff=args.backoff,
+    )
 
@@ -0,0 +1,112 @@
+import hashlib
+import math
+import os
+import struct
+
+HEADER = struct.Struct("<4sIQQ")  # magic, hash count, bit count, items added
+MAGIC = b"BLM1"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter stored as a flat bit array."""
+
+    def __init__(self, size, hashes, bits=None, count=0):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=0.001):
+        size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hashes)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            magic, hashes, size, count = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a Bloom filter file")
+            bits = bytearray(f.read())
+        if len(bits) != (size + 7) // 8:
+            raise ValueError(f"{path} is truncated")
+        return cls(size, hashes, bits, count)
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, self.hashes, self.size, self.count))
+            f.write(self.bits)
+        os.replace(tmp, path)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class SeenIndex:
+    """Links already handled: a set for the current run plus an optional Bloom filter of earlier runs.
+
+    A Bloom hit only means "maybe stored"; those links are passed to `confirm`
+    (e.g. a batched lookup against scraped_resources) and only the ones it
+    returns are skipped, so false positives never drop a new link. Without a
+    filter every new link goes to `confirm`.
+    """
+
+    def __init__(self, bloom=None, confirm=None):
+        self.current = set()
+        self.bloom = bloom
+        self.confirm = confirm
+
+    @classmethod
+    def open(cls, path, confirm, seed=None, capacity=1_000_000, error_rate=0.001):
+        """Load the filter at `path`, or build a new one from the `seed` links (e.g. every stored link)."""
+        try:
+            bloom = BloomFilter.load(path)
+        except (OSError, ValueError):
+            bloom = BloomFilter.for_capacity(capacity, error_rate)
+            for link in seed or ():
+                bloom.add(link)
+        return cls(bloom, confirm)
+
+    def save(self, path):
+        if self.bloom is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.bloom.save(path)
+
+    def clear(self):
+        self.current.clear()
+
+    def __contains__(self, link):
+        return link in self.current
+
+    def __len__(self):
+        return len(self.current)
+
+    def filter_new(self, links):
+        """Return the links not seen before, in order, and mark them as seen."""
+        candidates, maybe_stored = [], []
+        for link in links:
+            if link in self.current:
+                continue
+            self.current.add(link)
+            candidates.append(link)
+            if self.bloom is None or link in self.bloom:
+                maybe_stored.append(link)
+            else:
+                self.bloom.add(link)
+        if not maybe_stored or self.confirm is None:
+            return candidates
+        stored = self.confirm(maybe_stored)
+        return [link for link in candidates if link not in stored]
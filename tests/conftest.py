@@ -1,20 +1,25 @@
 import pytest
 import os
+import shutil
 import tempfile
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.main import app
-from app.database import Base
+from app.database import Base, enable_sqlite_foreign_keys, instrument_engine
 from app.routes import get_db
 from app import models
+from app.cache import entity_cache
 
-# Create a temporary SQLite database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+# Create a temporary SQLite database for testing, outside the source tree
+TEST_DB_DIR = tempfile.mkdtemp(prefix="app-tests-")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(TEST_DB_DIR, 'test.db')}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+instrument_engine(engine)
+enable_sqlite_foreign_keys(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def override_get_db():
@@ -30,6 +35,7 @@ app.dependency_overrides[get_db] = override_get_db
 def client():
     # Create tables for each test
     Base.metadata.create_all(bind=engine)
+    entity_cache.clear()
     yield TestClient(app)
     # Clean up after each test
     Base.metadata.drop_all(bind=engine)
@@ -45,3 +51,7 @@ def db_session():
         db.close()
         # Clean up after each test
         Base.metadata.drop_all(bind=engine)
+
+def pytest_sessionfinish(session, exitstatus):
+    engine.dispose()
+    shutil.rmtree(TEST_DB_DIR, ignore_errors=True)
@@ -51,8 +51,8 @@ def test_enroll_capacity_limit(client):
 
 def test_import_scraped_dedup_and_list(client):
     sample = [
-        {"title": "A", "link": "http://x/1", "image_url": "i", "price": "10", "scraped_at": "now"},
-        {"title": "B", "link": "http://x/2", "image_url": "i2", "price": "12", "scraped_at": "now"},
+        {"title": "A", "link": "http://x/1", "image_url": "i", "price": "10", "scraped_at": "2024-01-01 00:00:00"},
+        {"title": "B", "link": "http://x/2", "image_url": "i2", "price": "12", "scraped_at": "2024-01-01 00:00:00"},
     ]
     # first import adds 2
     r = client.post("/import/scraped", json=sample)
@@ -67,8 +67,8 @@ def test_import_scraped_dedup_and_list(client):
     # list shows at least 2
     r3 = client.get("/scraped_resources")
     assert r3.status_code == 200
-    assert isinstance(r3.json(), list)
-    assert len(r3.json()) >= 2
+    assert isinstance(r3.json()["items"], list)
+    assert len(r3.json()["items"]) >= 2
 
 
 def test_create_course_and_get(client):
@@ -81,3 +81,843 @@ def test_create_course_and_get(client):
     assert body["capacity"] == 30
 
 
+
+
+def test_bulk_insert_scraped_dedupes_in_batch_and_db(db_session):
+    from app import crud, models
+
+    items = [{"title": f"B{i}", "link": f"http://x/{i}", "price": "1.00"} for i in range(5)]
+    items.append({"title": "dup", "link": "http://x/0"})
+    ids = crud.bulk_insert_scraped(db_session, items, chunk_size=2)
+    assert len(ids) == 5
+    stored = {r.id: r for r in db_session.query(models.ScrapedResource).all()}
+    assert set(ids) == set(stored)
+    assert stored[ids[0]].title == "B0"
+
+    more = [{"title": "new", "link": "http://x/9"}] + items
+    ids2 = crud.bulk_insert_scraped(db_session, more, chunk_size=2)
+    assert len(ids2) == 1
+    assert db_session.get(models.ScrapedResource, ids2[0]).link == "http://x/9"
+
+
+def test_import_scraped_stream_ndjson(client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "INGEST_CHUNK_SIZE", 3)
+    lines = [
+        '{"title": "A", "link": "http://s/1"}',
+        '{"title": "B", "link": "http://s/2"}',
+        'not json',
+        '',
+        '{"title": "A again", "link": "http://s/1"}',
+        '{"link": "http://s/3"}',
+        '{"title": "C", "link": "http://s/3"}',
+    ]
+    r = client.post(
+        "/import/scraped/stream",
+        content="\n".join(lines).encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["accepted"], body["duplicate"], body["invalid"]) == (3, 1, 2)
+    assert body["batches"][0] == {"batch": 1, "accepted": 2, "duplicate": 0, "invalid": 1}
+    assert len(body["batches"]) == 2
+
+    r2 = client.post("/import/scraped/stream", content=b"{}", headers={"Content-Type": "application/json"})
+    assert r2.status_code == 415
+
+
+def test_list_scraped_keyset_pagination(client):
+    sample = [
+        {"title": f"T{i}", "link": f"http://p/{i}", "scraped_at": f"2024-01-0{i + 1} 10:00:00"}
+        for i in range(5)
+    ]
+    client.post("/import/scraped", json=sample)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/scraped_resources", params=params).json()
+        seen.extend(it["link"] for it in body["items"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [s["link"] for s in sample]
+
+    r = client.get("/scraped_resources", params={"scraped_from": "2024-01-02T00:00:00", "scraped_to": "2024-01-04T00:00:00"})
+    assert [it["title"] for it in r.json()["items"]] == ["T1", "T2"]
+
+    assert client.get("/scraped_resources", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/scraped_resources", params={"limit": 100000}).status_code == 422
+
+
+def test_enroll_tracks_seats_on_duplicate_unenroll_and_delete(client):
+    tid = _create_teacher(client, "T3", "t3@example.com")
+    cid = _create_course(client, "C3", 1, tid)
+    s1 = client.post("/students", json={"name": "S1", "email": "s1@example.com"}).json()["id"]
+    s2 = client.post("/students", json={"name": "S2", "email": "s2@example.com"}).json()["id"]
+
+    assert client.post(f"/students/{s1}/enroll", json={"course_id": cid}).status_code == 200
+    dup = client.post(f"/students/{s1}/enroll", json={"course_id": cid})
+    assert dup.status_code == 400
+    assert client.get(f"/courses/{cid}").json()["enrolled_count"] == 1
+
+    # unenrolling frees the seat for someone else
+    assert client.delete(f"/students/{s1}/enroll/{cid}").status_code == 200
+    assert client.delete(f"/students/{s1}/enroll/{cid}").status_code == 404
+    assert client.get(f"/courses/{cid}").json()["enrolled_count"] == 0
+    assert client.post(f"/students/{s2}/enroll", json={"course_id": cid}).status_code == 200
+
+    # so does deleting the student
+    assert client.delete(f"/students/{s2}").status_code == 200
+    assert client.get(f"/courses/{cid}").json()["enrolled_count"] == 0
+
+    missing = client.post(f"/students/{s1}/enroll", json={"course_id": 999999})
+    assert missing.json()["detail"] == "Course not found"
+
+
+def test_migration_backfills_enrolled_count(tmp_path):
+    from sqlalchemy import create_engine, text
+    from app import migrations
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE courses (id INTEGER PRIMARY KEY, title VARCHAR(255), capacity INTEGER)"))
+        conn.execute(text("CREATE TABLE enrollments (id INTEGER PRIMARY KEY, student_id INTEGER, course_id INTEGER)"))
+        conn.execute(text("INSERT INTO courses VALUES (1, 'C', 5)"))
+        conn.execute(text("INSERT INTO enrollments (student_id, course_id) VALUES (1, 1), (2, 1)"))
+    migrations.upgrade(engine)
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT enrolled_count FROM courses")).scalar() == 2
+
+
+def test_bulk_enroll_outcomes(client):
+    tid = _create_teacher(client, "T4", "t4@example.com")
+    cid = _create_course(client, "C4", 3, tid)
+    ids = [client.post("/students", json={"name": f"S{i}", "email": f"b{i}@example.com"}).json()["id"] for i in range(4)]
+    assert client.post(f"/students/{ids[0]}/enroll", json={"course_id": cid}).status_code == 200
+
+    r = client.post(f"/courses/{cid}/enrollments:bulk", json={"student_ids": ids + [ids[1], 424242]})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["enrolled"] == 2
+    assert [o["status"] for o in body["results"]] == [
+        "duplicate", "enrolled", "enrolled", "no-capacity", "duplicate", "unknown-student",
+    ]
+    assert client.get(f"/courses/{cid}").json()["enrolled_count"] == 3
+
+    assert client.post("/courses/999999/enrollments:bulk", json={"student_ids": ids}).status_code == 404
+
+
+def test_entity_cache_read_through_and_invalidation(client):
+    sid = client.post("/students", json={"name": "Cached", "email": "cached@example.com"}).json()["id"]
+    tid = _create_teacher(client, "T5", "t5@example.com")
+    cid = _create_course(client, "C5", 2, tid)
+
+    assert client.get(f"/students/{sid}").json()["name"] == "Cached"
+    assert client.get(f"/students/{sid}").json()["name"] == "Cached"
+    assert client.get(f"/courses/{cid}").json()["enrolled_count"] == 0
+    stats = client.get("/cache/stats").json()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+    # enrolling changes the course's seat count, so its entry is dropped
+    client.post(f"/students/{sid}/enroll", json={"course_id": cid})
+    assert client.get(f"/courses/{cid}").json()["enrolled_count"] == 1
+
+    client.delete(f"/students/{sid}")
+    assert client.get(f"/students/{sid}").status_code == 404
+    assert client.get(f"/courses/{cid}").json()["enrolled_count"] == 0
+    client.delete(f"/teachers/{tid}")
+    assert client.get(f"/courses/{cid}").status_code == 404
+
+
+def test_memory_cache_lru_and_ttl(monkeypatch):
+    from app import cache
+
+    c = cache.MemoryCache(maxsize=2, ttl=10)
+    c.set("a", {"v": 1})
+    c.set("b", {"v": 2})
+    assert c.get("a") == {"v": 1}
+    c.set("c", {"v": 3})
+    # "b" was least recently used
+    assert c.get("b") is None
+    assert c.stats()["evictions"] == 1
+
+    now = cache.time.monotonic()
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 11)
+    assert c.get("a") is None
+    assert c.stats()["expirations"] == 1
+
+
+def test_make_cache_rejects_an_incomplete_backend(monkeypatch):
+    from app import cache
+    from app.config import settings
+
+    class GetOnly(cache.CacheBackend):
+        def __init__(self, maxsize, ttl):
+            pass
+
+        def get(self, key):
+            return None
+
+    monkeypatch.setitem(cache.BACKENDS, "partial", GetOnly)
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "partial")
+    with pytest.raises(TypeError):
+        cache.make_cache()
+
+
+def test_sql_metrics_headers_and_prometheus_output(client, monkeypatch, caplog):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "SQL_DEBUG_HEADERS", True)
+    monkeypatch.setattr(settings, "QUERY_COUNT_WARN_THRESHOLD", 1)
+    r = client.post("/students", json={"name": "M", "email": "m@example.com"})
+    # INSERT plus the refresh SELECT
+    assert int(r.headers["X-DB-Query-Count"]) >= 2
+    assert float(r.headers["X-DB-Time-Ms"]) >= 0
+    assert "possible N+1" in caplog.text
+
+    client.get(f"/students/{r.json()['id']}")
+    text = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/students/{id}",status="200"}' in text
+    assert 'http_request_db_queries_bucket{method="POST",route="/students",le="+Inf"}' in text
+
+
+def test_sqlite_performance_profile(tmp_path):
+    from sqlalchemy import text
+    from app import crud, schemas
+    from app.database import Base, RoutingSession, make_session_factory
+
+    writer, reader, Session = make_session_factory(f"sqlite:///{tmp_path / 'perf.db'}", "performance")
+    Base.metadata.create_all(writer)
+    with Session() as db:
+        assert isinstance(db, RoutingSession)
+        assert db.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert db.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        # reads start on the read-only pool
+        assert db.execute(text("PRAGMA query_only")).scalar() == 1
+        s = crud.create_student(db, schemas.StudentCreate(name="P", email="p@example.com"))
+        # after a write the session sticks to the writer
+        assert db.get_bind() is writer
+        assert db.execute(text("PRAGMA query_only")).scalar() == 0
+    with Session() as db:
+        assert crud.get_student(db, s.id).email == "p@example.com"
+    assert writer.pool.size() == 1
+    writer.dispose()
+    reader.dispose()
+
+
+@pytest.mark.parametrize("profile", ["default", "performance"])
+def test_bulk_enroll_seat_read_holds_the_write_lock(tmp_path, profile):
+    import threading
+    from sqlalchemy import event
+    from app import crud, models
+    from app.database import Base, make_session_factory
+
+    writer, reader, Session = make_session_factory(f"sqlite:///{tmp_path / 'seats.db'}", profile)
+    Base.metadata.create_all(writer)
+    with Session() as db:
+        db.add_all([models.Course(id=1, title="C", capacity=3)] + [
+            models.Student(id=i, name=f"S{i}", email=f"s{i}@example.com") for i in range(1, 5)])
+        db.commit()
+
+    single = {}
+
+    def enroll_one():
+        with Session() as other:
+            try:
+                single["id"] = crud.enroll_student(other, 4, 1)
+            except ValueError as e:
+                single["error"] = str(e)
+
+    def after_seat_read(conn, cursor, statement, *args):
+        # a single enroll tries to commit between bulk_enroll's seat read and its UPDATE
+        if "courses.capacity" in statement and not single:
+            single["thread"] = t = threading.Thread(target=enroll_one)
+            t.start()
+            t.join(0.5)
+
+    for engine in {writer, reader}:
+        event.listen(engine, "after_cursor_execute", after_seat_read)
+    with Session() as db:
+        assert crud.bulk_enroll(db, 1, [1, 2, 3]) == [(1, "enrolled"), (2, "enrolled"), (3, "enrolled")]
+    single["thread"].join()
+    # the seat read held the write lock, so the single enroll ran after the bulk one
+    assert single.get("error") == "Course is full"
+    writer.dispose()
+    reader.dispose()
+
+
+def test_roster_and_schedule_use_constant_query_count(client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "SQL_DEBUG_HEADERS", True)
+    t = client.post("/teachers", json={"name": "T", "email": "t@roster.test"}).json()
+    small = client.post("/courses", json={"title": "Small", "capacity": 5, "teacher_id": t["id"]}).json()
+    big = client.post("/courses", json={"title": "Big", "capacity": 100, "teacher_id": t["id"]}).json()
+    ids = [client.post("/students", json={"name": f"S{i}", "email": f"s{i}@roster.test"}).json()["id"] for i in range(40)]
+    client.post(f"/courses/{small['id']}/enrollments:bulk", json={"student_ids": ids[:3]})
+    client.post(f"/courses/{big['id']}/enrollments:bulk", json={"student_ids": ids})
+
+    r_small = client.get(f"/courses/{small['id']}/roster")
+    r_big = client.get(f"/courses/{big['id']}/roster", params={"limit": 40})
+    assert r_small.json()["seats_used"] == 3 and r_small.json()["seats_available"] == 2
+    assert [e["student_id"] for e in r_big.json()["items"]] == ids
+    assert r_small.headers["X-DB-Query-Count"] == r_big.headers["X-DB-Query-Count"]
+
+    page = client.get(f"/courses/{big['id']}/roster", params={"limit": 15}).json()
+    seen = [e["student_id"] for e in page["items"]]
+    while page["next_cursor"]:
+        page = client.get(f"/courses/{big['id']}/roster", params={"limit": 15, "cursor": page["next_cursor"]}).json()
+        seen += [e["student_id"] for e in page["items"]]
+    assert seen == ids
+
+    one = client.get(f"/students/{ids[-1]}/courses")
+    two = client.get(f"/students/{ids[0]}/courses")
+    assert [c["title"] for c in one.json()["items"]] == ["Big"]
+    assert [(c["title"], c["seats_used"], c["capacity"]) for c in two.json()["items"]] == [("Small", 3, 5), ("Big", 40, 100)]
+    assert one.headers["X-DB-Query-Count"] == two.headers["X-DB-Query-Count"]
+
+    assert client.get("/courses/9999/roster").status_code == 404
+    assert client.get("/students/9999/courses").status_code == 404
+    assert client.get(f"/courses/{big['id']}/roster", params={"cursor": "bogus"}).status_code == 400
+
+
+def test_deletes_cascade_in_the_database(client, db_session):
+    from sqlalchemy import text
+
+    t = client.post("/teachers", json={"name": "T", "email": "t@cascade.test"}).json()["id"]
+    cid = _create_course(client, "C", 10, t)
+    other = _create_course(client, "Other", 10, None)
+    sids = [client.post("/students", json={"name": "S", "email": f"s{i}@cascade.test"}).json()["id"] for i in range(3)]
+    client.post(f"/courses/{cid}/enrollments:bulk", json={"student_ids": sids})
+    client.post(f"/courses/{other}/enrollments:bulk", json={"student_ids": sids})
+
+    assert client.delete(f"/students/{sids[0]}").status_code == 200
+    assert client.get(f"/courses/{other}").json()["enrolled_count"] == 2
+    assert client.delete(f"/teachers/{t}").status_code == 200
+    assert client.get(f"/courses/{cid}").status_code == 404
+    rows = db_session.execute(text("SELECT student_id, course_id FROM enrollments ORDER BY student_id")).all()
+    assert rows == [(sids[1], other), (sids[2], other)]
+    assert client.delete(f"/teachers/{t}").status_code == 404
+
+    # foreign keys are enforced now, so bad references are reported instead of stored
+    assert client.post("/courses", json={"title": "X", "teacher_id": 424242}).json()["detail"] == "Teacher not found"
+    assert client.post("/students/424242/enroll", json={"course_id": other}).json()["detail"] == "Student not found"
+    assert client.get(f"/courses/{other}").json()["enrolled_count"] == 2
+
+
+def test_bulk_delete_scraped_by_ids_and_before(client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "INGEST_CHUNK_SIZE", 3)
+    items = [
+        {"title": f"B{i}", "link": f"http://x.test/{i}", "scraped_at": f"2024-01-{i + 1:02d} 00:00:00"}
+        for i in range(10)
+    ]
+    client.post("/import/scraped", json=items)
+    ids = [it["id"] for it in client.get("/scraped_resources").json()["items"]]
+
+    r = client.delete("/scraped_resources", params={"ids": ids[:2] + [ids[0], 999999]})
+    assert r.json() == {"deleted": 2}
+    # 2024-01-03 .. 2024-01-08 are older than the cutoff: two full batches of 3
+    r = client.delete("/scraped_resources", params={"before": "2024-01-09T00:00:00"})
+    assert r.json() == {"deleted": 6}
+    assert [it["id"] for it in client.get("/scraped_resources").json()["items"]] == ids[8:]
+    assert client.delete("/scraped_resources").status_code == 400
+
+
+def test_migration_adds_on_delete_cascade(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+    from app import migrations
+    from app.database import enable_sqlite_foreign_keys
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    enable_sqlite_foreign_keys(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE teachers (id INTEGER PRIMARY KEY, name VARCHAR(255), email VARCHAR(255))"))
+        conn.execute(text("CREATE TABLE students (id INTEGER PRIMARY KEY, name VARCHAR(255), email VARCHAR(255))"))
+        conn.execute(text(
+            "CREATE TABLE courses (id INTEGER PRIMARY KEY, title VARCHAR(255), capacity INTEGER, "
+            "teacher_id INTEGER REFERENCES teachers (id))"
+        ))
+        conn.execute(text("CREATE INDEX ix_courses_id ON courses (id)"))
+        conn.execute(text(
+            "CREATE TABLE enrollments (id INTEGER PRIMARY KEY, student_id INTEGER REFERENCES students (id), "
+            "course_id INTEGER REFERENCES courses (id), enrolled_at DATETIME, "
+            "CONSTRAINT uq_student_course UNIQUE (student_id, course_id))"
+        ))
+        conn.execute(text("INSERT INTO teachers VALUES (1, 'T', 't@x')"))
+        conn.execute(text("INSERT INTO students VALUES (1, 'S', 's@x'), (2, 'S2', 's2@x')"))
+        conn.execute(text("INSERT INTO courses VALUES (1, 'C', 5, 1), (2, 'D', 5, NULL)"))
+        conn.execute(text("INSERT INTO enrollments (student_id, course_id) VALUES (1, 1), (2, 1), (1, 2)"))
+    migrations.upgrade(engine)
+    migrations.upgrade(engine)
+
+    for table in ("courses", "enrollments"):
+        assert {fk["options"].get("ondelete") for fk in inspect(engine).get_foreign_keys(table)} == {"CASCADE"}
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT enrolled_count FROM courses ORDER BY id")).scalars().all() == [2, 1]
+        conn.execute(text("DELETE FROM teachers WHERE id = 1"))
+        assert conn.execute(text("SELECT student_id, course_id FROM enrollments")).all() == [(1, 2)]
+        assert conn.execute(text("PRAGMA foreign_key_check")).all() == []
+
+
+def test_search_scraped_ranked_paged_and_in_sync(client):
+    titles = ["A Light in the Attic", "Light Light Light", "Dark Matter", "The Light Between Oceans", "Lighthouse"]
+    client.post("/import/scraped", json=[{"title": t, "link": f"http://x.test/{i}"} for i, t in enumerate(titles)])
+    client.post("/import/scraped/stream", content='{"title": "Night Light", "link": "http://x.test/s"}',
+                headers={"Content-Type": "application/x-ndjson"})
+
+    hits = client.get("/scraped_resources/search", params={"q": "light"}).json()["items"]
+    assert hits[0]["title"] == "Light Light Light"
+    assert sorted(h["title"] for h in hits) == ["A Light in the Attic", "Light Light Light", "Night Light", "The Light Between Oceans"]
+
+    page = client.get("/scraped_resources/search", params={"q": "light", "limit": 1}).json()
+    paged = [page["items"][0]["title"]]
+    while page["next_cursor"]:
+        page = client.get("/scraped_resources/search", params={"q": "light", "limit": 1, "cursor": page["next_cursor"]}).json()
+        paged += [it["title"] for it in page["items"]]
+    assert paged == [h["title"] for h in hits]
+
+    # deletes through any path drop out of the index; FTS operators in q are plain words
+    client.delete("/scraped_resources", params={"ids": [hits[0]["id"]]})
+    assert len(client.get("/scraped_resources/search", params={"q": "light OR dark"}).json()["items"]) == 0
+    assert len(client.get("/scraped_resources/search", params={"q": "light\""}).json()["items"]) == 3
+    assert client.get("/scraped_resources/search", params={"q": "--"}).status_code == 400
+
+
+def test_migration_builds_search_index_for_existing_rows(tmp_path):
+    from sqlalchemy import create_engine, text
+    from app import migrations
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE scraped_resources (id INTEGER PRIMARY KEY, title VARCHAR(255), link VARCHAR(1024))"))
+        conn.execute(text("INSERT INTO scraped_resources (title, link) VALUES ('Soumission', 'a'), ('Sharp Objects', 'b')"))
+    migrations.upgrade(engine)
+    migrations.upgrade(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO scraped_resources (title, link) VALUES ('Sharp Teeth', 'c')"))
+        hits = conn.execute(text("SELECT rowid FROM scraped_resources_fts WHERE scraped_resources_fts MATCH 'sharp' ORDER BY rowid"))
+        assert hits.scalars().all() == [2, 3]
+
+
+def test_migration_types_price_and_scraped_at(tmp_path):
+    from datetime import datetime
+    from sqlalchemy import create_engine, inspect, text
+    from sqlalchemy.orm import Session
+    from app import crud, migrations, models
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE scraped_resources (id INTEGER PRIMARY KEY, title VARCHAR(255), link VARCHAR(1024) UNIQUE, "
+            "image_url VARCHAR(1024), price VARCHAR(50), scraped_at VARCHAR(32))"
+        ))
+        conn.execute(text("CREATE INDEX ix_scraped_resources_scraped_at ON scraped_resources (scraped_at)"))
+        conn.execute(text(
+            "INSERT INTO scraped_resources (title, link, price, scraped_at) VALUES "
+            "('Soumission', 'a', '50.10', '2024-01-02 03:04:05'), ('Sharp Objects', 'b', 'No price', 'now'), "
+            "('Sapiens', 'c', '£9.99', '')"
+        ))
+    migrations.upgrade(engine)
+    migrations.upgrade(engine)
+
+    assert {c["name"] for c in inspect(engine).get_columns("scraped_resources")} == {
+        "id", "title", "link", "image_url", "price_minor", "currency", "scraped_at"}
+    assert {"ix_scraped_resources_price_minor", "ix_scraped_resources_scraped_at"} <= {
+        ix["name"] for ix in inspect(engine).get_indexes("scraped_resources")}
+    with Session(engine) as db:
+        rows = db.query(models.ScrapedResource).order_by(models.ScrapedResource.id).all()
+        assert [(r.price_minor, r.currency, r.scraped_at) for r in rows] == [
+            (5010, "GBP", datetime(2024, 1, 2, 3, 4, 5)), (None, None, None), (999, "GBP", None)]
+        assert [r["title"] for r in crud.search_scraped(db, "sharp")[0]] == ["Sharp Objects"]
+        crud.bulk_insert_scraped(db, [{"title": "Sharp Teeth", "link": "d"}])
+        assert len(crud.search_scraped(db, "sharp")[0]) == 2
+
+
+def test_migration_indexes_scraped_at_on_typed_tables(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+    from app import migrations
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE scraped_resources (id INTEGER PRIMARY KEY, title VARCHAR(255), link VARCHAR(1024) UNIQUE, "
+            "image_url VARCHAR(1024), price_minor INTEGER, currency VARCHAR(3), scraped_at DATETIME)"
+        ))
+    migrations.upgrade(engine)
+    migrations.upgrade(engine)
+    assert "ix_scraped_resources_scraped_at" in {ix["name"] for ix in inspect(engine).get_indexes("scraped_resources")}
+
+
+
+def test_mysql_insert_skips_only_duplicate_keys():
+    from sqlalchemy.dialects import mysql
+    from app import crud, models
+
+    sql = str(crud._insert_ignore_stmt("mysql", models.Student.__table__, "email").compile(dialect=mysql.dialect()))
+    # INSERT IGNORE would also store truncated or defaulted rows instead of failing
+    assert "IGNORE" not in sql
+    assert sql.endswith("ON DUPLICATE KEY UPDATE email = students.email")
+
+
+def test_price_text_uses_currency_exponent_and_legacy_default():
+    from app.schemas import ScrapedResourceIn
+
+    def price(value, **kw):
+        item = ScrapedResourceIn(title="t", link="l", price=value, **kw)
+        return item.price_minor, item.currency
+
+    # a bare price from the old scraper output gets the same currency the migration gives it
+    assert price("51.77") == (5177, "GBP")
+    assert price("51.77", currency="USD") == (5177, "USD")
+    assert price("¥500") == (500, "JPY")
+    assert price("£1,234.50") == (123450, "GBP")
+    assert price("No price") == (None, None)
+
+
+def test_scraped_at_accepts_z_and_offsets_as_naive_utc():
+    from datetime import datetime
+    from app.schemas import ScrapedResourceIn
+
+    def scraped_at(value):
+        return ScrapedResourceIn(title="t", link="l", scraped_at=value).scraped_at
+
+    # datetime.fromisoformat() only takes the "Z" suffix from Python 3.11
+    assert scraped_at("2024-02-01T10:00:00Z") == datetime(2024, 2, 1, 10, 0)
+    assert scraped_at("2024-02-01T12:00:00+02:00") == datetime(2024, 2, 1, 10, 0)
+    assert scraped_at("2024-02-01 10:00:00") == datetime(2024, 2, 1, 10, 0)
+    assert scraped_at("") is None and scraped_at(None) is None
+    with pytest.raises(ValueError):
+        scraped_at("yesterday")
+
+
+def test_list_scraped_price_filters_and_sort(client):
+    prices = ["£5.00", "£12.50", "No price", "£12.50", "£30.00", "£1.99"]
+    items = [
+        {"title": f"B{i}", "link": f"http://x.test/{i}", "price": p, "scraped_at": f"2024-02-0{i + 1}T00:00:00Z"}
+        for i, p in enumerate(prices)
+    ]
+    client.post("/import/scraped", json=items)
+
+    def walk(**params):
+        page = client.get("/scraped_resources", params=dict(params, limit=2)).json()
+        out = page["items"]
+        while page["next_cursor"]:
+            page = client.get("/scraped_resources", params=dict(params, limit=2, cursor=page["next_cursor"])).json()
+            out += page["items"]
+        return out
+
+    by_price = walk(sort="price")
+    assert [it["price_minor"] for it in by_price] == [199, 500, 1250, 1250, 3000]
+    assert by_price[0]["currency"] == "GBP"
+    assert [it["title"] for it in walk(sort="-price", min_price=500, max_price=1250)] == ["B3", "B1", "B0"]
+    assert [it["title"] for it in walk(sort="-scraped_at", scraped_from="2024-02-03T00:00:00")] == ["B5", "B4", "B3", "B2"]
+    assert client.get("/scraped_resources", params={"sort": "title"}).status_code == 400
+    # a cursor only continues the ordering it came from
+    cursor = client.get("/scraped_resources", params={"sort": "price", "limit": 1}).json()["next_cursor"]
+    assert client.get("/scraped_resources", params={"sort": "-price", "cursor": cursor}).status_code == 400
+
+
+def test_conditional_get_returns_304_until_the_table_changes(client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "SQL_DEBUG_HEADERS", True)
+    sid = client.post("/students", json={"name": "Etag", "email": "etag@example.com"}).json()["id"]
+    tid = _create_teacher(client, "T9", "t9@example.com")
+    cid = _create_course(client, "C9", 5, tid)
+    client.post("/import/scraped", json=[{"title": "A", "link": "http://etag.test/a", "price": "£1.00"}])
+
+    # single rows answer from the entity cache, the list runs only the version lookup
+    for path, queries in ((f"/students/{sid}", "0"), (f"/courses/{cid}", "0"), ("/scraped_resources", "1")):
+        first = client.get(path)
+        etag = first.headers["ETag"]
+        assert etag.startswith('"') and not etag.startswith("W/")
+        again = client.get(path, headers={"If-None-Match": etag})
+        assert again.status_code == 304 and again.content == b""
+        assert again.headers["ETag"] == etag
+        assert again.headers["X-DB-Query-Count"] == queries
+        assert client.get(path, headers={"If-None-Match": '"stale", ' + etag}).status_code == 304
+        assert client.get(path, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+    course_etag = client.get(f"/courses/{cid}").headers["ETag"]
+    student_etag = client.get(f"/students/{sid}").headers["ETag"]
+    other = _create_course(client, "C10", 5, tid)
+    other_etag = client.get(f"/courses/{other}").headers["ETag"]
+    client.post(f"/students/{sid}/enroll", json={"course_id": cid})
+    r = client.get(f"/courses/{cid}", headers={"If-None-Match": course_etag})
+    assert r.status_code == 200 and r.json()["enrolled_count"] == 1
+    # versions are per row: other courses, students and imports don't move them
+    client.post("/import/scraped", json=[{"title": "C", "link": "http://etag.test/c"}])
+    client.post("/students", json={"name": "Other", "email": "other@example.com"})
+    assert client.get(f"/courses/{other}", headers={"If-None-Match": other_etag}).status_code == 304
+    assert client.get(f"/students/{sid}", headers={"If-None-Match": student_etag}).status_code == 304
+    client.delete(f"/students/{sid}/enroll/{cid}")
+    assert client.get(f"/courses/{cid}", headers={"If-None-Match": r.headers["ETag"]}).json()["enrolled_count"] == 0
+
+    list_etag = client.get("/scraped_resources").headers["ETag"]
+    # an import with nothing new leaves the version alone
+    client.post("/import/scraped", json=[{"title": "A", "link": "http://etag.test/a"}])
+    assert client.get("/scraped_resources", headers={"If-None-Match": list_etag}).status_code == 304
+    client.post("/import/scraped", json=[{"title": "B", "link": "http://etag.test/b"}])
+    r = client.get("/scraped_resources", headers={"If-None-Match": list_etag})
+    assert r.status_code == 200 and len(r.json()["items"]) == 3
+
+    student_etag = client.get(f"/students/{sid}").headers["ETag"]
+    client.delete(f"/students/{sid}")
+    assert client.get(f"/students/{sid}", headers={"If-None-Match": student_etag}).status_code == 404
+
+
+def test_row_etag_comes_from_the_cached_body(client):
+    from app.cache import course_key, entity_cache
+
+    tid = _create_teacher(client, "T11", "t11@example.com")
+    sid = client.post("/students", json={"name": "Race", "email": "race@example.com"}).json()["id"]
+    cid = _create_course(client, "C11", 5, tid)
+    before = client.get(f"/courses/{cid}")
+    assert "version" not in before.json()
+    stale = entity_cache.get(course_key(cid))
+    client.post(f"/students/{sid}/enroll", json={"course_id": cid})
+    # a reader that loaded the course before the enroll stores it after the writer's invalidation
+    entity_cache.set(course_key(cid), stale)
+    r = client.get(f"/courses/{cid}")
+    # the stale body keeps its own ETag, so no client is told the old body is the new version
+    assert r.json()["enrolled_count"] == 0 and r.headers["ETag"] == before.headers["ETag"]
+    entity_cache.delete(course_key(cid))
+    r = client.get(f"/courses/{cid}", headers={"If-None-Match": before.headers["ETag"]})
+    assert r.status_code == 200 and r.json()["enrolled_count"] == 1
+
+
+def test_async_import_runs_as_a_background_job(client, db_session, monkeypatch):
+    import time
+    from datetime import datetime
+    from sqlalchemy.orm import sessionmaker
+    from app import jobs, models, schemas
+
+    runner = jobs.JobRunner(sessionmaker(bind=db_session.get_bind()), workers=2, chunk_size=2)
+    monkeypatch.setattr(jobs, "runner", runner)
+
+    def wait_for(job_id):
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] in ("done", "failed"):
+                return job
+            time.sleep(0.02)
+        raise AssertionError(f"job {job_id} did not finish")
+
+    items = [{"title": f"J{i}", "link": f"http://job.test/{i}", "price": "£1.00"} for i in range(5)]
+    r = client.post("/import/scraped", params={"async": "true"}, json=items + [items[0]])
+    assert r.status_code == 202
+    job_id = r.json()["job_id"]
+    assert r.headers["Location"] == f"/jobs/{job_id}"
+    # nothing runs until the lifespan starts the pool
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "queued"
+
+    runner.start()
+    try:
+        job = wait_for(job_id)
+        assert (job["status"], job["total"], job["processed"], job["accepted"], job["duplicate"]) == ("done", 6, 6, 5, 1)
+        assert job["error"] is None and job["finished_at"] is not None
+        assert len(client.get("/scraped_resources").json()["items"]) == 5
+    finally:
+        runner.stop()
+
+    # a job that was running when the process died continues after its last committed chunk
+    more = [{"title": f"R{i}", "link": f"http://job.test/r{i}", "price": "£2.00"} for i in range(4)]
+    payload = schemas.SCRAPED_ITEMS.dump_json(schemas.SCRAPED_ITEMS.validate_python(more)).decode()
+    interrupted = models.ImportJob(status="running", payload=payload, total=4, processed=2, accepted=2, duplicate=0,
+                                   created_at=datetime(2024, 1, 1))
+    broken = models.ImportJob(status="queued", payload="not json", total=1, created_at=datetime(2024, 1, 1))
+    db_session.add_all([interrupted, broken])
+    db_session.commit()
+
+    runner.start()
+    try:
+        job = wait_for(interrupted.id)
+        assert (job["status"], job["processed"], job["accepted"]) == ("done", 4, 4)
+        links = {it["link"] for it in client.get("/scraped_resources").json()["items"]}
+        assert {"http://job.test/r2", "http://job.test/r3"} <= links and "http://job.test/r0" not in links
+        job = wait_for(broken.id)
+        assert job["status"] == "failed" and job["error"]
+    finally:
+        runner.stop()
+    assert client.get("/jobs/9999").status_code == 404
+
+
+
+def test_import_job_lease_is_only_taken_over_once_expired(client, db_session, monkeypatch):
+    import time
+    from datetime import datetime
+    from sqlalchemy.orm import sessionmaker
+    from app import crud, jobs, models, schemas
+
+    Session = sessionmaker(bind=db_session.get_bind())
+    items = [{"title": f"L{i}", "link": f"http://lease.test/{i}"} for i in range(4)]
+    payload = schemas.SCRAPED_ITEMS.dump_json(schemas.SCRAPED_ITEMS.validate_python(items)).decode()
+    # another live process is running this job and renewed its lease just now
+    job = models.ImportJob(status="running", payload=payload, total=4, processed=2, accepted=2, duplicate=0,
+                           owner="other:1", heartbeat_at=crud.utcnow(), created_at=datetime(2024, 1, 1))
+    db_session.add(job)
+    db_session.commit()
+
+    runner = jobs.JobRunner(Session, workers=1, chunk_size=2, lease_seconds=0.5)
+    monkeypatch.setattr(jobs, "runner", runner)
+    runner.start()
+    try:
+        assert client.get(f"/jobs/{job.id}").json()["status"] == "running"
+        # the other runner has lost the job only once its lease has run out
+        deadline = time.monotonic() + 10
+        while client.get(f"/jobs/{job.id}").json()["status"] != "done":
+            assert time.monotonic() < deadline, "expired job was not taken over"
+            time.sleep(0.05)
+    finally:
+        runner.stop()
+    assert client.get(f"/jobs/{job.id}").json()["processed"] == 4
+    # the old owner's next chunk writes nothing
+    with Session() as db:
+        stale = crud.get_import_job(db, job.id)
+        assert crud.import_job_chunk(db, stale, [{"title": "X", "link": "http://lease.test/x"}], "other:1") is False
+    assert "http://lease.test/x" not in {it["link"] for it in client.get("/scraped_resources").json()["items"]}
+
+
+def test_bulk_create_students_and_teachers(client, monkeypatch):
+    from app.config import settings
+
+    client.post("/students", json={"name": "Old", "email": "old@bulk.test"})
+    people = [{"name": f"S{i}", "email": f"s{i}@bulk.test"} for i in range(5)]
+    r = client.post("/students:bulk", json=people + [{"name": "Again", "email": "old@bulk.test"}, people[1]])
+    assert r.status_code == 200
+    body = r.json()
+    assert body["created"] == 5
+    assert [x["status"] for x in body["results"]] == ["created"] * 5 + ["exists", "duplicate"]
+    assert body["results"][5]["id"] is not None and body["results"][6]["id"] is None
+    sid = body["results"][0]["id"]
+    assert client.get(f"/students/{sid}").json() == {"id": sid, "name": "S0", "email": "s0@bulk.test"}
+
+    r = client.post("/teachers:bulk", json=[{"name": "T", "email": "t@bulk.test"}] * 2)
+    assert [x["status"] for x in r.json()["results"]] == ["created", "duplicate"]
+
+    # CSV, flushed every 2 valid rows; a bad row is reported and the rest still go in
+    monkeypatch.setattr(settings, "INGEST_CHUNK_SIZE", 2)
+    csv_body = (
+        "email,name\r\n"
+        "c0@bulk.test,C0\r\n"
+        '"c1@bulk.test","Last, First"\r\n'
+        "\r\n"
+        "only-an-email@bulk.test\r\n"
+        "s0@bulk.test,Existing\r\n"
+        "c2@bulk.test,C2\r\n"
+        "c0@bulk.test,C0 again\r\n"
+    )
+    r = client.post("/students:bulk/stream", content=csv_body, headers={"Content-Type": "text/csv"})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [(x["index"], x["status"]) for x in results] == [
+        (0, "created"), (1, "created"), (2, "invalid"), (3, "exists"), (4, "created"), (5, "exists")]
+    assert results[2]["email"] == "only-an-email@bulk.test" and results[2]["detail"]
+    assert client.get(f"/students/{results[1]['id']}").json()["name"] == "Last, First"
+
+    assert client.post("/teachers:bulk/stream", content="name\nx\n", headers={"Content-Type": "text/csv"}).status_code == 400
+    assert client.post("/teachers:bulk/stream", content="name,email\n", headers={"Content-Type": "application/json"}).status_code == 415
+
+
+def test_scraped_change_feed_and_stream(client, db_session, monkeypatch):
+    import asyncio
+    import time
+    from sqlalchemy.orm import sessionmaker
+    from app import crud, routes
+    from app.config import settings
+
+    items = [{"title": f"F{i}", "link": f"http://feed.test/{i}", "price": "£1.00"} for i in range(4)]
+    client.post("/import/scraped", json=items[:3])
+    client.post("/import/scraped", json=items)
+    ids = [it["id"] for it in client.get("/scraped_resources").json()["items"]]
+    client.delete(f"/scraped_resources/{ids[0]}")
+    client.delete("/scraped_resources", params={"ids": [ids[1], 999]})
+
+    r = client.get("/scraped_resources/changes")
+    assert r.status_code == 200
+    changes = r.json()["items"]
+    assert [(c["op"], c["id"]) for c in changes] == [
+        ("insert", ids[0]), ("insert", ids[1]), ("insert", ids[2]), ("insert", ids[3]), ("delete", ids[0]), ("delete", ids[1])]
+    assert [c["seq"] for c in changes] == sorted(c["seq"] for c in changes)
+    # inserts carry the row while it exists
+    assert changes[0]["resource"] is None and changes[4]["link"] == "http://feed.test/0"
+    assert changes[2]["resource"]["title"] == "F2" and changes[2]["resource"]["price_minor"] == 100
+
+    # paging: the cursor moves past what was returned, and stays put when nothing is new
+    page = client.get("/scraped_resources/changes", params={"limit": 4}).json()
+    rest = client.get("/scraped_resources/changes", params={"since": page["next_cursor"]}).json()
+    assert [c["seq"] for c in page["items"] + rest["items"]] == [c["seq"] for c in changes]
+    r = client.get("/scraped_resources/changes", params={"since": rest["next_cursor"]})
+    assert r.json() == {"items": [], "next_cursor": rest["next_cursor"]}
+    assert client.get("/scraped_resources/changes", params={"since": rest["next_cursor"]},
+                      headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
+    client.post("/import/scraped", json=[{"title": "F9", "link": "http://feed.test/9"}])
+    r = client.get("/scraped_resources/changes", params={"since": rest["next_cursor"]},
+                   headers={"If-None-Match": r.headers["ETag"]})
+    assert [c["link"] for c in r.json()["items"]] == ["http://feed.test/9"]
+    assert client.get("/scraped_resources/changes", params={"since": "nope"}).status_code == 400
+    # a delete that matches nothing writes nothing and leaves the version alone
+    etag = client.get("/scraped_resources").headers["ETag"]
+    assert client.delete("/scraped_resources", params={"ids": [999]}).json() == {"deleted": 0}
+    assert client.delete("/scraped_resources/999").status_code == 404
+    assert client.get("/scraped_resources").headers["ETag"] == etag
+    assert client.get("/scraped_resources/changes/stream", headers={"Last-Event-ID": "nope"}).status_code == 400
+
+    # the stream replays from a cursor, then a commit wakes it well before the next poll
+    monkeypatch.setattr(settings, "CHANGE_FEED_POLL_SECONDS", 30.0)
+    Session = sessionmaker(bind=db_session.get_bind())
+
+    class Request:
+        gone = False
+
+        async def is_disconnected(self):
+            return self.gone
+
+    async def follow():
+        request = Request()
+        events = routes._scraped_change_events(request, Session(), crud.change_seq(rest["next_cursor"]))
+        replayed = await anext(events)
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.2, lambda: loop.run_in_executor(
+            None, crud.import_scraped, Session(), [{"title": "F10", "link": "http://feed.test/10"}]))
+        pushed = await asyncio.wait_for(anext(events), 10)
+        request.gone = True
+        await events.aclose()
+        return replayed, pushed, time.monotonic() - start
+
+    replayed, pushed, waited = asyncio.run(follow())
+    assert replayed.startswith("id: ") and "event: insert\n" in replayed and "http://feed.test/9" in replayed
+    cursor = pushed.split("\n")[0].removeprefix("id: ")
+    assert "http://feed.test/10" in pushed and pushed.endswith("\n\n") and waited < 5
+    assert client.get("/scraped_resources/changes", params={"since": cursor}).json()["items"] == []
+
+    # an idle stream survives its poll timeouts: keep-alives, then a change committed elsewhere
+    monkeypatch.setattr(settings, "CHANGE_FEED_POLL_SECONDS", 0.02)
+    monkeypatch.setattr(settings, "CHANGE_FEED_KEEPALIVE_SECONDS", 0.1)
+
+    async def idle():
+        request = Request()
+        events = routes._scraped_change_events(request, Session(), crud.change_seq(cursor))
+        frames = [await asyncio.wait_for(anext(events), 5) for _ in range(2)]
+        # written without notify(), as another process would
+        with Session() as db:
+            crud._insert_new_scraped(db, [{"title": "F11", "link": "http://feed.test/11"}])
+            db.commit()
+        while not frames[-1].startswith("id: "):
+            frames.append(await asyncio.wait_for(anext(events), 5))
+        request.gone = True
+        await events.aclose()
+        return frames
+
+    frames = asyncio.run(idle())
+    assert frames[:2] == [": keep-alive\n\n"] * 2 and "http://feed.test/11" in frames[-1]
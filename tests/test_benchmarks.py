@@ -0,0 +1,22 @@
+from benchmarks.run import compare
+
+
+def test_compare_flags_only_regressions_past_threshold():
+    baseline = {
+        "crud.get_student.ops_per_sec": 1000.0,
+        "crud.create_student.ops_per_sec": 100.0,
+        "load.GET /students/{id}.p99_ms": 10.0,
+        "load.GET /students/{id}.errors": 0,
+        "parse.lxml.pages_per_sec": 400.0,
+    }
+    current = {
+        "crud.get_student.ops_per_sec": 700.0,  # 30% slower
+        "crud.create_student.ops_per_sec": 90.0,  # within threshold
+        "load.GET /students/{id}.p99_ms": 14.0,  # 40% slower, under the load threshold
+        "load.GET /students/{id}.errors": 5,  # not a timed metric
+    }
+    flagged = compare(current, baseline, threshold=0.25, load_threshold=0.5)
+    assert [r[0] for r in flagged] == ["crud.get_student.ops_per_sec"]
+    assert [r[0] for r in compare(current, baseline, threshold=0.25)] == [
+        "crud.get_student.ops_per_sec", "load.GET /students/{id}.p99_ms",
+    ]
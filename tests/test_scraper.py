@@ -0,0 +1,333 @@
+import hashlib
+import json
+import pathlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scraper import scrape
+from scraper.fetch import Fetcher, HostRateLimiter, RobotsCache
+from scraper.parse import PARSERS, SoupParser
+from scraper.pipeline import CollectSink, DbWriter, JsonArrayWriter, JsonlWriter, Pipeline
+from scraper.seen import BloomFilter, SeenIndex
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+
+class CatalogueHandler(BaseHTTPRequestHandler):
+    # stand-in for books.toscrape.com, serving the saved catalogue pages
+    hits = []
+    # paths that answer 503 once before serving normally
+    flaky = set()
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        if self.path in self.flaky:
+            self.flaky.discard(self.path)
+            self.send_error(503)
+            return
+        if self.path == "/robots.txt":
+            body = b"User-agent: *\nAllow: /\n"
+        elif self.path == "/":
+            body = (FIXTURES / "catalogue-page-1.html").read_bytes()
+        elif self.path.startswith("/catalogue/page-"):
+            page = FIXTURES / ("catalogue-" + self.path.rsplit("/", 1)[1])
+            if not page.exists():
+                self.send_error(404)
+                return
+            body = page.read_bytes()
+        elif self.path.startswith("/catalogue/") and self.path.endswith("/index.html"):
+            body = b"<html><body>book detail</body></html>"
+        else:
+            self.send_error(404)
+            return
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def site():
+    CatalogueHandler.hits = []
+    CatalogueHandler.flaky = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CatalogueHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    scrape.seen_urls.clear()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_scrape_pages_concurrent(site):
+    books = scrape.collect_pages(site, 3, Fetcher(concurrency=3, rate=0))
+    assert len(books) == 60
+    assert len({b["link"] for b in books}) == 60
+    # results keep page order even though pages are fetched in parallel
+    scrape.seen_urls.clear()
+    first = scrape.parse_book_data((FIXTURES / "catalogue-page-1.html").read_text(), site)
+    assert [b["link"] for b in books[:20]] == [b["link"] for b in first]
+    assert all(isinstance(b["price_minor"], int) and b["currency"] == "GBP" for b in books)
+    # the first book on fixture page 1 costs £13.09
+    assert (first[0]["price_minor"], first[0]["currency"]) == (1309, "GBP")
+
+
+def test_robots_download_only_blocks_its_own_host():
+    downloading, slow = threading.Event(), threading.Event()
+
+    class Session:
+        def get(self, url, timeout):
+            if url.startswith("http://slow"):
+                downloading.set()
+                slow.wait(5)
+            return type("Response", (), {"status_code": 200, "text": "User-agent: *\nDisallow: /private\n"})()
+
+    robots = RobotsCache(Session())
+    waiting = threading.Thread(target=robots.allowed, args=("http://slow/page",))
+    waiting.start()
+    downloading.wait(5)
+    start = time.perf_counter()
+    assert robots.allowed("http://fast/page") and not robots.allowed("http://fast/private")
+    assert time.perf_counter() - start < 1
+    slow.set()
+    waiting.join()
+    assert (robots.stats["robots_misses"], robots.stats["robots_hits"]) == (2, 1)
+
+
+def test_scrape_pages_missing_page(site):
+    books = scrape.collect_pages(site, 4, Fetcher(concurrency=2, rate=0))
+    assert len(books) == 60
+
+
+def test_robots_and_response_cache(site, tmp_path):
+    fetcher = Fetcher(concurrency=2, rate=0, cache_dir=str(tmp_path))
+    first = scrape.collect_pages(site, 3, fetcher)
+    assert fetcher.stats["http_misses"] == 3
+    # robots.txt is downloaded once for the host, not once per page
+    assert CatalogueHandler.hits.count("/robots.txt") == 1
+    assert fetcher.stats["robots_hits"] == 2
+
+    # a fresh run revalidates from disk and gets 304s back
+    scrape.seen_urls.clear()
+    fetcher = Fetcher(concurrency=2, rate=0, cache_dir=str(tmp_path))
+    second = scrape.collect_pages(site, 3, fetcher)
+    assert fetcher.stats["http_hits"] == 3
+    assert fetcher.stats["http_misses"] == 0
+    assert [b["link"] for b in second] == [b["link"] for b in first]
+
+
+def test_host_rate_limiter_spaces_requests():
+    limiter = HostRateLimiter(rate=20)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.wait("http://example.test/a")
+    # first token is free, the next four wait 1/20s each
+    assert time.monotonic() - start >= 0.18
+
+
+@pytest.mark.parametrize("name", sorted(PARSERS))
+def test_parser_backends_agree(name):
+    for page in sorted(FIXTURES.glob("catalogue-page-*.html")):
+        html = page.read_text(encoding="utf-8")
+        records = PARSERS[name]().extract(html)
+        assert len(records) == 20
+        assert records == SoupParser().extract(html)
+
+
+def test_seen_index_persists_and_confirms(tmp_path):
+    path = str(tmp_path / "seen.bloom")
+    html = (FIXTURES / "catalogue-page-1.html").read_text(encoding="utf-8")
+    site = "http://books.test/"
+
+    first = SeenIndex.open(path, confirm=lambda links: set(), seed=[])
+    books = scrape.parse_book_data(html, site, seen=first)
+    assert len(books) == 20
+    assert scrape.parse_book_data(html, site, seen=first) == []
+    first.save(path)
+
+    # next run: half the links made it into the DB, the rest must not be dropped
+    stored = {b["link"] for b in books[:10]}
+    asked = []
+
+    def confirm(links):
+        asked.extend(links)
+        return stored & set(links)
+
+    second = SeenIndex.open(path, confirm=confirm)
+    again = scrape.parse_book_data(html, site, seen=second)
+    assert [b["link"] for b in again] == [b["link"] for b in books[10:]]
+    assert len(asked) == 20
+
+
+def test_bloom_filter_roundtrip(tmp_path):
+    bloom = BloomFilter.for_capacity(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"http://x/{i}")
+    path = str(tmp_path / "b.bloom")
+    bloom.save(path)
+    loaded = BloomFilter.load(path)
+    assert all(f"http://x/{i}" in loaded for i in range(1000))
+    false_hits = sum(f"http://y/{i}" in loaded for i in range(1000))
+    assert false_hits < 50
+
+
+def test_pipeline_streams_to_json_jsonl_and_db(site, tmp_path):
+    saved = []
+
+    def save(batch):
+        saved.append(len(batch))
+        return len(batch)
+
+    collect = CollectSink()
+    sinks = [
+        JsonArrayWriter(str(tmp_path / "out.json")),
+        JsonlWriter(str(tmp_path / "out.jsonl")),
+        DbWriter(save, batch_size=25),
+        collect,
+    ]
+    stats = scrape.scrape_pages(site, 3, Fetcher(concurrency=3, rate=0), sinks=sinks, queue_size=1)
+
+    assert [s.name for s in stats] == ["fetch", "parse", "json", "jsonl", "db", "collect"]
+    assert all(s.items_out == 60 for s in stats[1:])
+    assert stats[0].items_out == 3
+
+    array_text = (tmp_path / "out.json").read_text(encoding="utf-8")
+    expected = [dict(b, scraped_at=b["scraped_at"].isoformat()) for b in collect.items]
+    assert array_text == json.dumps(expected, indent=2, ensure_ascii=False)
+    lines = (tmp_path / "out.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == expected
+    # DB writes are flushed as the buffer fills, not once at the end
+    assert saved == [40, 20]
+
+
+def test_pipeline_bounds_fetching_ahead_of_a_slow_page():
+    done = []
+
+    def fetch_page(i):
+        if i == 0:
+            time.sleep(0.3)
+        done.append(i)
+        return str(i)
+
+    sink = CollectSink()
+    Pipeline(fetch_page, lambda i, html: [int(html)], 100, [sink], workers=4, queue_size=2).run()
+    assert sink.items == list(range(100))
+    # while page 0 is slow the others wait for it instead of all 99 piling up in the reorder buffer
+    assert done.index(0) < 4 + 2
+
+
+def test_json_array_writer_extends_a_resumed_file(tmp_path):
+    path = str(tmp_path / "out.json")
+    writer = JsonArrayWriter(path)
+    writer.write([{"title": "a"}, {"title": "b"}])
+    writer.close()
+    writer = JsonArrayWriter(path, append=True)
+    writer.write([{"title": "c"}])
+    writer.close()
+    assert writer.count == 1
+    assert json.loads(pathlib.Path(path).read_text(encoding="utf-8")) == [{"title": t} for t in "abc"]
+
+    # a killed run leaves no closing bracket and maybe half an item
+    writer = JsonArrayWriter(path)
+    writer.write([{"title": "a"}, {"title": "b"}])
+    writer.f.write(',\n  {\n    "title": "c')
+    writer.f.close()
+    writer = JsonArrayWriter(path, append=True)
+    writer.write([{"title": "d"}])
+    writer.close()
+    assert json.loads(pathlib.Path(path).read_text(encoding="utf-8")) == [{"title": t} for t in "abd"]
+
+
+def test_incremental_crawl_skips_unchanged_pages_and_stops_at_known_links(site, tmp_path):
+    from scraper.incremental import IncrementalCrawl, PageHashes
+
+    hashes_path = str(tmp_path / "pages.json")
+    stored = set()
+
+    def run(stop_after):
+        # a fresh seen index per run, confirming against what earlier runs "stored"
+        seen = SeenIndex(confirm=lambda links: stored.intersection(links))
+        crawl = IncrementalCrawl(PageHashes.load(hashes_path), stop_after)
+        sink = CollectSink()
+        stats = scrape.scrape_pages(site, 3, Fetcher(concurrency=1, rate=0), seen=seen, sinks=[sink], incremental=crawl)
+        stored.update(b["link"] for b in sink.items)
+        crawl.hashes.save(hashes_path)
+        return crawl, sink.items, stats
+
+    crawl, books, stats = run(stop_after=2)
+    assert (crawl.parsed, crawl.skipped, len(books)) == (3, 0, 60)
+    assert not crawl.stop.is_set()
+    assert crawl.line(stats[0].items_out) == "incremental: 3 pages fetched, 0 skipped (unchanged), 3 parsed"
+
+    # nothing changed: the first two pages are skipped unparsed and the crawl stops before page 3
+    crawl, books, _ = run(stop_after=2)
+    assert (crawl.parsed, crawl.skipped, books) == (0, 2, [])
+    assert crawl.stop.is_set()
+
+    # a page that changed is parsed again, but all its links are stored, so it still counts as known
+    hashes = json.loads(pathlib.Path(hashes_path).read_text())
+    hashes[site] = "stale"
+    pathlib.Path(hashes_path).write_text(json.dumps(hashes))
+    crawl, books, _ = run(stop_after=2)
+    assert (crawl.parsed, crawl.skipped, books) == (1, 1, [])
+    assert crawl.stop.is_set()
+
+
+def test_frontier_crawl_retries_resumes_and_follows_details(site, tmp_path):
+    from scraper.frontier import Frontier
+
+    path = str(tmp_path / "frontier.db")
+    frontier = Frontier(path, backoff=0.01)
+    CatalogueHandler.flaky = {"/catalogue/page-2.html"}
+    sink = CollectSink()
+    # pages 4 and 5 don't exist: a 404 is not retried
+    scrape.scrape_pages(site, 5, Fetcher(concurrency=2, rate=0), sinks=[sink], frontier=frontier)
+    assert len(sink.items) == 60
+    assert frontier.counts() == {"pending": 0, "in_flight": 0, "done": 3, "failed": 2}
+    assert CatalogueHandler.hits.count("/catalogue/page-2.html") == 2
+    assert CatalogueHandler.hits.count("/catalogue/page-4.html") == 1
+    # links on page 2 are relative to /catalogue/
+    assert sink.items[20]["link"].startswith(site + "catalogue/") and sink.items[20]["link"].endswith("/index.html")
+    assert sink.items[20]["image_url"].startswith(site + "media/")
+    frontier.close()
+
+    # a run killed with page 2 in flight and page 3 still queued
+    frontier = Frontier(path)
+    frontier.reset()
+    for i in range(3):
+        frontier.add(scrape.page_url(site, i))
+    frontier.done(frontier.claim().url)
+    frontier.claim()
+    assert frontier.requeue_in_flight() == 1
+    CatalogueHandler.hits = []
+    scrape.seen_urls.clear()
+    sink = CollectSink()
+    scrape.scrape_pages(site, 3, Fetcher(concurrency=1, rate=0), sinks=[sink], frontier=frontier)
+    assert [h for h in CatalogueHandler.hits if h != "/robots.txt"] == ["/catalogue/page-2.html", "/catalogue/page-3.html"]
+    assert len(sink.items) == 40
+    frontier.close()
+
+    # detail pages of new books are queued behind every catalogue page, one level deep
+    frontier = Frontier(path)
+    frontier.reset()
+    CatalogueHandler.hits = []
+    scrape.seen_urls.clear()
+    scrape.scrape_pages(site, 2, Fetcher(concurrency=1, rate=0), sinks=[CollectSink()], frontier=frontier, max_depth=1)
+    hits = [h for h in CatalogueHandler.hits if h != "/robots.txt"]
+    assert hits[:2] == ["/", "/catalogue/page-2.html"] and len(hits) == 42
+    assert frontier.counts()["done"] == 42
+    frontier.close()